@@ -509,6 +509,9 @@ def _add_logging_args(parser):
     group.add_argument('--log-world-size-to-tensorboard',
                        action='store_true',
                        help='Enable world size logging to tensorboard.')
+    group.add_argument('--sync-log-datetime', action='store_true',
+                       help='Synchronize all ranks before printing the '
+                       'datetime of the main setup and training stages.')
     
     group.add_argument('--wandb-entity-name', type=str, default=None,
                         help="Name of wandb entity for reporting")
@@ -635,7 +638,8 @@ def _add_training_args(parser):
                        help='Exit the program after the iteration is divisible '
                        'by this value.')
     group.add_argument('--exit-duration-in-mins', type=int, default=None,
-                       help='Exit the program after this many minutes.')
+                       help='Exit the program after this many minutes. '
+                       'Checked every --log-interval iterations.')
     group.add_argument('--exit-signal-handler', action='store_true',
                        help='Dynamically save the checkpoint and shutdown the '
                        'training if SIGTERM is received')
@@ -679,6 +683,16 @@ def _add_training_args(parser):
                        help='Disable fusing gradient accumulation to weight '
                        'gradient computation of linear layers',
                        dest='gradient_accumulation_fusion')
+    group.add_argument('--jit-warmup-stamp-dir', type=str, default=None,
+                       help='If set, record a stamp file in this directory '
+                       'after the JIT fusion warmup and skip the warmup on '
+                       'later runs with the same configuration. The fused '
+                       'kernels are then compiled during the first training '
+                       'iterations instead.')
+    group.add_argument('--use-torch-compile', action='store_true',
+                       help='Compile each model chunk with torch.compile '
+                       '(inductor) before the fp16 and DDP wrappers are '
+                       'applied. Requires PyTorch 2.2 or later.')
     return parser
 
 
@@ -757,6 +771,11 @@ def _add_checkpointing_args(parser):
                        help='Do not save current optimizer.')
     group.add_argument('--no-save-rng', action='store_true', default=None,
                        help='Do not save current rng state.')
+    group.add_argument('--async-save', action='store_true',
+                       help='Write the checkpoints saved during training in '
+                       'a background thread. The state is copied to the host '
+                       'first, and a checkpoint is only marked as the latest '
+                       'once the next save starts or training ends.')
     group.add_argument('--load', type=str, default=None,
                        help='Directory containing a model checkpoint.')
     group.add_argument('--no-load-optim', action='store_true', default=None,
@@ -862,8 +881,11 @@ def _add_distributed_args(parser):
                        'initialization uses CPU' )
     group.add_argument('--empty-unused-memory-level', default=0, type=int,
                        choices=[0, 1, 2],
-                       help='Call torch.cuda.empty_cache() each iteration '
-                       '(training and eval), to reduce fragmentation.'
+                       help='Call torch.cuda.empty_cache() to reduce '
+                       'fragmentation. At level 1 training only does so every '
+                       '50 iterations and when over 25%% of the reserved '
+                       'memory is inactive, and eval once before evaluating; '
+                       'level 2 does so after every step in both. '
                        '0=off, 1=moderate, 2=aggressive.')
     group.add_argument('--standalone-embedding-stage', action='store_true',
                        default=False, help='If set, *input* embedding layer '
@@ -875,6 +897,10 @@ def _add_distributed_args(parser):
     group.add_argument('--distributed-timeout', default=600, type=float,
                        help='Timeout for distributed operations, in seconds. '
                        'Should be at least as high as the dataset preprocessing ans checkpoint saving times.')
+    group.add_argument('--compile-global-barrier', action='store_true',
+                       help='Synchronize all ranks after the fused kernels '
+                       'are compiled and loaded. Only needed if the '
+                       'filesystem is slow to propagate the build outputs.')
 
     return parser
 
@@ -1035,6 +1061,9 @@ def _add_data_args(parser):
                        help="Dataloader number of workers.")
     group.add_argument('--valid-num-workers', type=int, default=2,
                        help="Dataloader number of workers for validation.")
+    group.add_argument('--prefetch-factor', type=int, default=4,
+                       help="Number of batches loaded in advance by each "
+                       "dataloader worker.")
     group.add_argument('--tokenizer-type', type=str,
                        default=None,
                        choices=['BertWordPieceLowerCase',
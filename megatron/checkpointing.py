@@ -15,9 +15,11 @@
 
 """Input/output checkpointing."""
 
+import copy
 import os
 import random
 import sys
+import threading
 import numpy as np
 
 import torch
@@ -31,6 +33,12 @@ from megatron.model.enums import PositionEmbeddingType
 
 
 _CHECKPOINT_VERSION = None
+# Checkpoint being written in the background by an async save, as
+# (thread, iteration, errors raised by the thread).
+_ASYNC_SAVE = None
+# Side stream and pinned host buffers used to stage async saves.
+_STAGING_STREAM = None
+_STAGING_BUFFERS = []
 
 def set_checkpoint_version(value):
     global _CHECKPOINT_VERSION
@@ -225,10 +233,132 @@ def get_rng_state():
     return rng_state_list
 
 
-def save_checkpoint(iteration, model, optimizer, opt_param_scheduler):
-    """Save a model checkpoint."""
+def _stage_state_to_host(state_dicts):
+    """Copy all tensors in nested state dicts to the host.
+
+    Device tensors are copied asynchronously on a side stream into pinned
+    buffers, which are kept and reused by the next save when the tensors
+    still match. Returns the host state dicts and an event to wait on
+    before reading them.
+    """
+    global _STAGING_STREAM, _STAGING_BUFFERS
+    if _STAGING_STREAM is None:
+        _STAGING_STREAM = torch.cuda.Stream()
+    old_buffers = _STAGING_BUFFERS
+    buffers = []
+    staged = {}
+
+    def stage(obj):
+        if torch.is_tensor(obj):
+            # Tensors shared within the state are staged only once.
+            if id(obj) in staged:
+                return staged[id(obj)]
+            if not obj.is_cuda:
+                host = obj.detach().clone()
+            else:
+                i = len(buffers)
+                if i < len(old_buffers) and \
+                   old_buffers[i].shape == obj.shape and \
+                   old_buffers[i].dtype == obj.dtype:
+                    host = old_buffers[i]
+                else:
+                    host = torch.empty(obj.shape, dtype=obj.dtype,
+                                       pin_memory=True)
+                host.copy_(obj.detach(), non_blocking=True)
+                buffers.append(host)
+            staged[id(obj)] = host
+            return host
+        if isinstance(obj, dict):
+            obj = copy.copy(obj)
+            for key in obj:
+                obj[key] = stage(obj[key])
+            return obj
+        if isinstance(obj, list):
+            return [stage(x) for x in obj]
+        if isinstance(obj, tuple):
+            return tuple(stage(x) for x in obj)
+        return obj
+
+    _STAGING_STREAM.wait_stream(torch.cuda.current_stream())
+    with torch.cuda.stream(_STAGING_STREAM):
+        host_state_dicts = [stage(state_dict) for state_dict in state_dicts]
+        copied = _STAGING_STREAM.record_event()
+    # Later kernels may update the staged tensors, so they have to wait for
+    # the copies; the host does not.
+    torch.cuda.current_stream().wait_event(copied)
+    _STAGING_BUFFERS = buffers
+    return host_state_dicts, copied
+
+
+def _write_checkpoint_files(model_state_dict, optim_state_dict,
+                            model_checkpoint_name, optim_checkpoint_name,
+                            use_distributed_optimizer):
+    if use_distributed_optimizer:
+        # Save model separate from optimizer.
+        if model_state_dict:
+            ensure_directory_exists(model_checkpoint_name)
+            torch.save(model_state_dict, model_checkpoint_name)
+        if optim_state_dict:
+            ensure_directory_exists(optim_checkpoint_name)
+            torch.save(optim_state_dict, optim_checkpoint_name)
+    else:
+        # Save model and optimizer together.
+        state_dict = {**model_state_dict, **optim_state_dict}
+        if state_dict: # only saves if populated (i.e., inherits conditions above)
+            ensure_directory_exists(model_checkpoint_name)
+            torch.save(state_dict, model_checkpoint_name)
+
+
+def _finish_save(iteration):
     args = get_args()
 
+    # Wait so everyone is done (necessary)
+    if torch.distributed.is_initialized():
+        torch.distributed.barrier()
+
+    print_rank_0('  successfully saved checkpoint at iteration {:7d} to {}'.format(
+        iteration, args.save))
+
+    # And update the latest iteration
+    if not torch.distributed.is_initialized() or torch.distributed.get_rank() == 0:
+        tracker_filename = get_checkpoint_tracker_filename(args.save)
+        with open(tracker_filename, 'w') as f:
+            f.write(str(iteration))
+
+    # Wait so everyone is done (not necessary)
+    if torch.distributed.is_initialized():
+        torch.distributed.barrier()
+
+
+def finalize_async_save():
+    """Wait for a checkpoint being written in the background and mark it as
+    the latest one. Needs to be called on all ranks, and before exiting."""
+    global _ASYNC_SAVE
+    if _ASYNC_SAVE is None:
+        return
+    thread, iteration, errors = _ASYNC_SAVE
+    _ASYNC_SAVE = None
+    thread.join()
+    if errors:
+        raise errors[0]
+    _finish_save(iteration)
+
+
+def save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
+                    async_save=False):
+    """Save a model checkpoint.
+
+    With `async_save`, the state is staged in pinned host memory and
+    written to disk by a background thread, and the checkpoint only becomes
+    the latest one in `finalize_async_save`, which the next save calls
+    first.
+    """
+    global _ASYNC_SAVE
+    args = get_args()
+
+    # Only one checkpoint is written in the background at a time.
+    finalize_async_save()
+
     # Only rank zero of the data parallel writes to the disk.
     model = unwrap_model(model)
 
@@ -278,38 +408,35 @@ def save_checkpoint(iteration, model, optimizer, opt_param_scheduler):
             optim_state_dict['opt_param_scheduler'] = \
                 opt_param_scheduler.state_dict()
 
-    # Save.
-    if args.use_distributed_optimizer:
-        # Save model separate from optimizer.
-        if model_state_dict:
-            ensure_directory_exists(model_checkpoint_name)
-            torch.save(model_state_dict, model_checkpoint_name)
-        if optim_state_dict:
-            ensure_directory_exists(optim_checkpoint_name)
-            torch.save(optim_state_dict, optim_checkpoint_name)
-    else:
-        # Save model and optimizer together.
-        state_dict = {**model_state_dict, **optim_state_dict}
-        if state_dict: # only saves if populated (i.e., inherits conditions above)
-            ensure_directory_exists(model_checkpoint_name)
-            torch.save(state_dict, model_checkpoint_name)
-
-    # Wait so everyone is done (necessary)
-    if torch.distributed.is_initialized():
-        torch.distributed.barrier()
+    if async_save:
+        # Snapshot everything the training loop keeps updating.
+        if 'args' in model_state_dict:
+            model_state_dict['args'] = copy.copy(args)
+        (model_state_dict, optim_state_dict), copied = \
+            _stage_state_to_host([model_state_dict, optim_state_dict])
+        errors = []
+
+        def write():
+            try:
+                copied.synchronize()
+                _write_checkpoint_files(model_state_dict, optim_state_dict,
+                                        model_checkpoint_name,
+                                        optim_checkpoint_name,
+                                        args.use_distributed_optimizer)
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        _ASYNC_SAVE = (thread, iteration, errors)
+        return
 
-    print_rank_0('  successfully saved checkpoint at iteration {:7d} to {}'.format(
-        iteration, args.save))
-
-    # And update the latest iteration
-    if not torch.distributed.is_initialized() or torch.distributed.get_rank() == 0:
-        tracker_filename = get_checkpoint_tracker_filename(args.save)
-        with open(tracker_filename, 'w') as f:
-            f.write(str(iteration))
+    # Save.
+    _write_checkpoint_files(model_state_dict, optim_state_dict,
+                            model_checkpoint_name, optim_checkpoint_name,
+                            args.use_distributed_optimizer)
+    _finish_save(iteration)
 
-    # Wait so everyone is done (not necessary)
-    if torch.distributed.is_initialized():
-        torch.distributed.barrier()
 
 def _transpose_first_dim(t, num_splits, num_splits_first, model):
     input_shape = t.size()
@@ -53,11 +53,18 @@ def build_pretraining_data_loader(dataset, consumed_samples, num_workers=None):
                 args.dataloader_type))
 
     num_workers = args.num_workers if num_workers is None else num_workers
+    # Keep the workers alive across passes over the data (e.g. with the
+    # cyclic iterator) instead of respawning them for every pass.
+    worker_kwargs = {}
+    if num_workers > 0:
+        worker_kwargs = dict(persistent_workers=True,
+                             prefetch_factor=args.prefetch_factor)
     # Torch dataloader.
     return torch.utils.data.DataLoader(dataset,
                                        batch_sampler=batch_sampler,
                                        num_workers=num_workers,
-                                       pin_memory=True)
+                                       pin_memory=True,
+                                       **worker_kwargs)
 
 class MegatronPretrainingSampler:
 
@@ -79,12 +79,18 @@ def get_datasets_weights_and_num_samples(data_prefix,
 
 
 def compile_helper():
-    """Compile helper function ar runtime. Make sure this
-    is invoked on a single process."""
+    """Compile helper function ar runtime. Concurrent invocations (e.g.
+    one per node on a shared filesystem) are serialized with a file lock."""
+    import fcntl
     import os
     import subprocess
     path = os.path.abspath(os.path.dirname(__file__))
-    ret = subprocess.run(['make', '-C', path])
+    with open(os.path.join(path, '.helpers.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            ret = subprocess.run(['make', '-C', path])
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
     if ret.returncode != 0:
         print("Making C++ dataset helpers module failed, exiting.")
         import sys
@@ -13,49 +13,94 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import os
 import pathlib
 import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
+import torch
 from torch.utils import cpp_extension
-from megatron.fused_kernels.utils import _create_build_dir
-
-# Do not override TORCH_CUDA_ARCH_LIST to allow for pre-compilation in Dockerfile
-# os.environ["TORCH_CUDA_ARCH_LIST"] = ""
+from megatron.fused_kernels.utils import (_create_build_dir,
+                                          _get_kernel_cache_dir,
+                                          _kernel_cache_key,
+                                          _load_cached_extension,
+                                          _publish_to_kernel_cache)
 
 
 def load(args):
-    # Check if cuda 11 is installed for compute capability 8.0
-    cc_flag = []
-    _, bare_metal_major, _ = _get_cuda_bare_metal_version(
+    # Do not override TORCH_CUDA_ARCH_LIST to allow for pre-compilation in
+    # Dockerfile: when it is set, build exactly those architectures.
+    # Otherwise only generate code for the device we are running on. nvcc
+    # older than 11 cannot target compute capability 8.0+, so fall back to
+    # sm_70 PTX there and let the driver JIT it.
+    nvcc_version, bare_metal_major, _ = _get_cuda_bare_metal_version(
         cpp_extension.CUDA_HOME)
-    if int(bare_metal_major) >= 11:
-        cc_flag.append('-gencode')
-        cc_flag.append('arch=compute_80,code=sm_80')
+    cc_flag = _arch_list_gencode_flags(
+        os.environ.get('TORCH_CUDA_ARCH_LIST', ''))
+    if not cc_flag:
+        if torch.cuda.is_available():
+            major, minor = torch.cuda.get_device_capability()
+            if major >= 8 and int(bare_metal_major) < 11:
+                cc_flag = ['-gencode', 'arch=compute_70,code=compute_70']
+            else:
+                cc_flag = ['-gencode',
+                           'arch=compute_{0}{1},code=sm_{0}{1}'.format(
+                               major, minor)]
+        else:
+            cc_flag = ['-gencode', 'arch=compute_70,code=sm_70']
+            if int(bare_metal_major) >= 11:
+                cc_flag.append('-gencode')
+                cc_flag.append('arch=compute_80,code=sm_80')
 
     # Build path
     srcpath = pathlib.Path(__file__).parent.absolute()
     buildpath = srcpath / 'build'
     _create_build_dir(buildpath)
+    cachepath = _get_kernel_cache_dir(buildpath)
 
-    # Helper function to build the kernels.
+    # Helper function to build the kernels. Built extensions are kept in a
+    # content-addressed cache so later runs can skip ninja altogether.
     def _cpp_extention_load_helper(name, sources, extra_cuda_flags):
-        return cpp_extension.load(
+        extra_cflags = ['-O3',]
+        extra_cuda_cflags = ['-O3',] + extra_cuda_flags + cc_flag
+        if cachepath is not None:
+            key = _kernel_cache_key(name, sources,
+                                    extra_cflags + extra_cuda_cflags,
+                                    nvcc_version)
+            cached = cachepath / '{}-{}.so'.format(name, key)
+            if cached.exists():
+                return _load_cached_extension(name, cached)
+
+        kernel_buildpath = buildpath / name
+        _create_build_dir(kernel_buildpath)
+        module = cpp_extension.load(
             name=name,
             sources=sources,
-            build_directory=buildpath,
-            extra_cflags=['-O3',],
-            extra_cuda_cflags=['-O3',
-                               '-gencode', 'arch=compute_70,code=sm_70',
-                               '--use_fast_math'] + extra_cuda_flags + cc_flag,
+            build_directory=kernel_buildpath,
+            extra_cflags=extra_cflags,
+            extra_cuda_cflags=extra_cuda_cflags,
             verbose=(args.rank == 0)
         )
 
+        if cachepath is not None:
+            try:
+                _publish_to_kernel_cache(module.__file__, cached)
+            except OSError as e:
+                print(f"Could not add {name} to the kernel cache: {e}")
+        return module
+
+    # Kernels to build as (name, sources, extra_cuda_flags).
+    jobs = []
+
     # ==============
     # Fused softmax.
     # ==============
 
     if args.masked_softmax_fusion:
-        extra_cuda_flags = ['-U__CUDA_NO_HALF_OPERATORS__',
+        extra_cuda_flags = ['--use_fast_math',
+                            '-U__CUDA_NO_HALF_OPERATORS__',
                             '-U__CUDA_NO_HALF_CONVERSIONS__',
                             '--expt-relaxed-constexpr',
                             '--expt-extended-lambda']
@@ -63,43 +108,78 @@ def load(args):
         # Upper triangular softmax.
         sources=[srcpath / 'scaled_upper_triang_masked_softmax.cpp',
                  srcpath / 'scaled_upper_triang_masked_softmax_cuda.cu']
-        scaled_upper_triang_masked_softmax_cuda = _cpp_extention_load_helper(
-            "scaled_upper_triang_masked_softmax_cuda",
-            sources, extra_cuda_flags)
+        jobs.append(("scaled_upper_triang_masked_softmax_cuda",
+                     sources, extra_cuda_flags))
 
         # Masked softmax.
         sources=[srcpath / 'scaled_masked_softmax.cpp',
                  srcpath / 'scaled_masked_softmax_cuda.cu']
-        scaled_masked_softmax_cuda = _cpp_extention_load_helper(
-            "scaled_masked_softmax_cuda", sources, extra_cuda_flags)
+        jobs.append(("scaled_masked_softmax_cuda", sources, extra_cuda_flags))
 
         # Softmax
         sources=[srcpath / 'scaled_softmax.cpp',
                  srcpath / 'scaled_softmax_cuda.cu']
-        scaled_softmax_cuda = _cpp_extention_load_helper(
-            "scaled_softmax_cuda", sources, extra_cuda_flags)
+        jobs.append(("scaled_softmax_cuda", sources, extra_cuda_flags))
 
     # =================================
     # Mixed precision fused layer norm.
     # =================================
 
-    extra_cuda_flags = ['-maxrregcount=50']
+    # The mean/variance reduction is numerically sensitive, so build
+    # without --use_fast_math. 64 registers keeps the warp reduction from
+    # spilling while still leaving good occupancy on Ampere.
+    extra_cuda_flags = ['-maxrregcount=64', '--fmad=true']
     sources=[srcpath / 'layer_norm_cuda.cpp',
              srcpath / 'layer_norm_cuda_kernel.cu']
-    fused_mix_prec_layer_norm_cuda = _cpp_extention_load_helper(
-        "fused_layer_norm_cuda", sources, extra_cuda_flags)
+    jobs.append(("fused_layer_norm_cuda", sources, extra_cuda_flags))
 
     # =================================
     # Fused gradient accumulation to weight gradient computation of linear layer
     # =================================
 
     if args.gradient_accumulation_fusion:
-        sources=[srcpath / 'fused_weight_gradient_dense.cpp',
-                 srcpath / 'fused_weight_gradient_dense.cu']
-        fused_dense_cuda = _cpp_extention_load_helper(
-            "fused_dense_cuda", sources, [])
-
-
+        # Apex built with --fused_weight_gradient_mlp ships the same kernel
+        # with the same interface; use it instead of compiling our copy.
+        try:
+            import fused_weight_gradient_mlp_cuda
+            sys.modules['fused_dense_cuda'] = fused_weight_gradient_mlp_cuda
+        except ImportError:
+            sources=[srcpath / 'fused_weight_gradient_dense.cpp',
+                     srcpath / 'fused_weight_gradient_dense.cu']
+            jobs.append(("fused_dense_cuda", sources, ['--use_fast_math']))
+
+    # Each nvcc invocation is a separate process, so the builds can run
+    # concurrently. Every kernel has its own build directory to avoid
+    # contending on the ninja lock.
+    max_workers = max(1, min(len(jobs), (os.cpu_count() or 1) // 4))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_cpp_extention_load_helper, *job)
+                   for job in jobs]
+        for future in futures:
+            future.result()
+
+
+def _arch_list_gencode_flags(arch_list):
+    """nvcc -gencode flags for a TORCH_CUDA_ARCH_LIST such as
+    "7.0;8.0;8.6+PTX"."""
+    flags = []
+    for arch in arch_list.replace(',', ';').replace(' ', ';').split(';'):
+        if not arch:
+            continue
+        ptx = arch.endswith('+PTX')
+        num = arch[:-len('+PTX')] if ptx else arch
+        num = num.replace('.', '')
+        if not num.isdigit():
+            # Named architectures are left to the device-based default.
+            continue
+        flags += ['-gencode', 'arch=compute_{0},code=sm_{0}'.format(num)]
+        if ptx:
+            flags += ['-gencode',
+                      'arch=compute_{0},code=compute_{0}'.format(num)]
+    return flags
+
+
+@functools.lru_cache(maxsize=4)
 def _get_cuda_bare_metal_version(cuda_dir):
     raw_output = subprocess.check_output([cuda_dir + "/bin/nvcc", "-V"],
                                          universal_newlines=True)
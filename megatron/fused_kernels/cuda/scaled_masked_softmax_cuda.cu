@@ -18,9 +18,7 @@
 #include <cuda.h>
 #include <cuda_runtime.h>
 #include <cuda_fp16.h>
-#include <cuda_profiler_api.h>
 #include <ATen/cuda/CUDAContext.h>
-#include <torch/extension.h>
 #include "scaled_masked_softmax.h"
 #include "type_shim.h"
 
@@ -33,9 +31,9 @@ int get_batch_per_block_cuda(int query_seq_len, int key_seq_len, int batches, in
 }
 
 
-torch::Tensor fwd_cuda(
-    torch::Tensor const& input,
-    torch::Tensor const& mask,
+at::Tensor fwd_cuda(
+    at::Tensor const& input,
+    at::Tensor const& mask,
     float scale_factor)
 {
   // input is a 4d tensor with dimensions [batches, attn_heads, seq_len, seq_len]
@@ -53,8 +51,8 @@ torch::Tensor fwd_cuda(
 
   // Output 
   auto act_options = input.options().requires_grad(false);
-  torch::Tensor softmax_results = 
-      torch::empty({batches, attn_heads, query_seq_len, key_seq_len}, act_options);
+  at::Tensor softmax_results = 
+      at::empty({batches, attn_heads, query_seq_len, key_seq_len}, act_options);
 
   // Softmax Intermediate Result Ptr
   void* input_ptr = static_cast<void*>(input.data_ptr());
@@ -78,9 +76,9 @@ torch::Tensor fwd_cuda(
   return softmax_results;
 }
 
-torch::Tensor bwd_cuda(
-    torch::Tensor const& output_grads_, 
-    torch::Tensor const& softmax_results_, 
+at::Tensor bwd_cuda(
+    at::Tensor const& output_grads_, 
+    at::Tensor const& softmax_results_, 
     float scale_factor)  {
 	
   auto output_grads = output_grads_.contiguous();
@@ -18,9 +18,7 @@
 #include <cuda.h>
 #include <cuda_runtime.h>
 #include <cuda_fp16.h>
-#include <cuda_profiler_api.h>
 #include <ATen/cuda/CUDAContext.h>
-#include <torch/extension.h>
 #include "scaled_masked_softmax.h"
 #include "type_shim.h"
 
@@ -28,8 +26,8 @@ namespace multihead_attn {
 namespace fused_softmax {
 namespace scaled_softmax {
 
-torch::Tensor fwd_cuda(
-    torch::Tensor const& input,
+at::Tensor fwd_cuda(
+    at::Tensor const& input,
     float scale_factor)
 {
   // input is a 4d tensor with dimensions [batches, attn_heads, seq_len, seq_len]
@@ -42,8 +40,8 @@ torch::Tensor fwd_cuda(
 
   // Output 
   auto act_options = input.options().requires_grad(false);
-  torch::Tensor softmax_results = 
-      torch::empty({batches, attn_heads, query_seq_len, key_seq_len}, act_options);
+  at::Tensor softmax_results = 
+      at::empty({batches, attn_heads, query_seq_len, key_seq_len}, act_options);
 
   // Softmax Intermediate Result Ptr
   void* input_ptr = static_cast<void*>(input.data_ptr());
@@ -64,9 +62,9 @@ torch::Tensor fwd_cuda(
   return softmax_results;
 }
 
-torch::Tensor bwd_cuda(
-    torch::Tensor const& output_grads_, 
-    torch::Tensor const& softmax_results_, 
+at::Tensor bwd_cuda(
+    at::Tensor const& output_grads_, 
+    at::Tensor const& softmax_results_, 
     float scale_factor)  {
 	
   auto output_grads = output_grads_.contiguous();
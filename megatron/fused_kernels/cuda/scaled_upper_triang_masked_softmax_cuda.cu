@@ -18,9 +18,7 @@
 #include <cuda.h>
 #include <cuda_runtime.h>
 #include <cuda_fp16.h>
-#include <cuda_profiler_api.h>
 #include <ATen/cuda/CUDAContext.h>
-#include <torch/extension.h>
 #include "scaled_upper_triang_masked_softmax.h"
 #include "type_shim.h"
 
@@ -28,8 +26,8 @@ namespace multihead_attn {
 namespace fused_softmax {
 namespace scaled_upper_triang_masked_softmax {
 
-torch::Tensor fwd_cuda(
-    torch::Tensor const& input, 
+at::Tensor fwd_cuda(
+    at::Tensor const& input, 
     float scale_factor)
 {
   // input is a 3d tensor with dimensions [attn_batches, seq_len, seq_len]
@@ -39,8 +37,8 @@ torch::Tensor fwd_cuda(
 
   // Output 
   auto act_options = input.options().requires_grad(false);
-  torch::Tensor softmax_results = 
-      torch::empty({attn_batches, seq_len, seq_len}, act_options);
+  at::Tensor softmax_results = 
+      at::empty({attn_batches, seq_len, seq_len}, act_options);
 
   // Softmax Intermediate Result Ptr
   void* input_ptr = static_cast<void*>(input.data_ptr());
@@ -61,9 +59,9 @@ torch::Tensor fwd_cuda(
 }
 				      
 
-torch::Tensor bwd_cuda(
-    torch::Tensor const& output_grads_, 
-    torch::Tensor const& softmax_results_, 
+at::Tensor bwd_cuda(
+    at::Tensor const& output_grads_, 
+    at::Tensor const& softmax_results_, 
     float scale_factor)  {
 	
   auto output_grads = output_grads_.contiguous();
@@ -1,4 +1,13 @@
+import fcntl
+import hashlib
+import importlib.util
 import os
+import pathlib
+import shutil
+import sys
+import tempfile
+
+import torch
 
 
 def _create_build_dir(buildpath):
@@ -7,3 +16,77 @@ def _create_build_dir(buildpath):
     except OSError:
         if not os.path.isdir(buildpath):
             print(f"Creation of the build directory {buildpath} failed")
+
+
+def _get_kernel_cache_dir(buildpath):
+    """Directory holding prebuilt kernel artifacts, or None if disabled.
+
+    `MEGATRON_KERNEL_CACHE` takes precedence, then PyTorch's
+    `PYTORCH_KERNEL_CACHE_PATH`; otherwise the cache lives next to the
+    build directory. `USE_PYTORCH_KERNEL_CACHE=0` disables the cache.
+    """
+    if os.environ.get('USE_PYTORCH_KERNEL_CACHE', '1') == '0':
+        return None
+    if 'MEGATRON_KERNEL_CACHE' in os.environ:
+        cachepath = pathlib.Path(os.environ['MEGATRON_KERNEL_CACHE'])
+    elif 'PYTORCH_KERNEL_CACHE_PATH' in os.environ:
+        cachepath = pathlib.Path(
+            os.environ['PYTORCH_KERNEL_CACHE_PATH']) / 'megatron'
+    else:
+        cachepath = pathlib.Path(buildpath) / 'cache'
+    try:
+        os.makedirs(cachepath, exist_ok=True)
+    except OSError:
+        print(f"Creation of the kernel cache directory {cachepath} failed, "
+              "kernel caching is disabled")
+        return None
+    return cachepath
+
+
+def _kernel_cache_key(name, sources, flags, toolchain_version):
+    """Content hash of everything that affects the built extension."""
+    sha = hashlib.sha1()
+    sha.update(name.encode())
+    # Headers are not listed as sources but are compiled in as well.
+    srcdirs = set(pathlib.Path(s).parent for s in sources)
+    headers = sorted(h for d in srcdirs for h in d.glob('*.h'))
+    for path in list(sources) + headers:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    sha.update(repr(flags).encode())
+    sha.update(toolchain_version.encode())
+    sha.update(torch.__version__.encode())
+    sha.update(str(torch.version.cuda).encode())
+    sha.update(sys.version.encode())
+    return sha.hexdigest()
+
+
+def _load_cached_extension(name, path):
+    """Import a prebuilt extension and register it under `name`."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[name] = module
+    return module
+
+
+def _publish_to_kernel_cache(library, cached):
+    """Atomically copy a freshly built extension into the cache."""
+    cached = pathlib.Path(cached)
+    with open(str(cached) + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if cached.exists():
+                return
+            fd, tmp = tempfile.mkstemp(dir=cached.parent,
+                                       suffix='.so.tmp')
+            os.close(fd)
+            try:
+                shutil.copy2(library, tmp)
+                os.replace(tmp, cached)
+            except OSError:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
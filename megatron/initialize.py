@@ -15,15 +15,19 @@
 
 """Megatron initialization."""
 
+import hashlib
+import inspect
 import logging
 import logging.config
 import random
 import os
 import sys
+import threading
 import time
 
 import numpy as np
 import torch
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 try:
@@ -55,6 +59,9 @@ def initialize_megatron(extra_args_provider=None, args_defaults={},
     Returns a function to finalize distributed env initialization 
     (optionally, only when args.lazy_mpu_init == True)
     """
+    # Must happen before the CUDA driver is initialized.
+    _configure_cuda_compute_cache()
+
     if not allow_no_cuda:
         # Make sure cuda is available.
         assert torch.cuda.is_available(), 'Megatron requires CUDA.'
@@ -108,6 +115,20 @@ def initialize_megatron(extra_args_provider=None, args_defaults={},
         return None
 
 
+def _configure_cuda_compute_cache():
+    """Size the CUDA driver's persistent JIT cache.
+
+    Fused kernels compiled to PTX only are translated to SASS by the
+    driver at load time; with a large enough on-disk cache that work is
+    done once per node instead of once per process. The driver reads
+    these variables at initialization, so user settings take precedence
+    and CUDA_CACHE_DISABLE=1 still turns the cache off.
+    """
+    os.environ.setdefault('CUDA_CACHE_PATH',
+                          os.path.expanduser('~/.nv/ComputeCache'))
+    os.environ.setdefault('CUDA_CACHE_MAXSIZE', str(2 << 30))
+
+
 def _configure_logging():
     args=get_args()
     if not args.structured_logs:
@@ -147,34 +168,62 @@ def _configure_logging():
         logging_config["loggers"]["default"]["handlers"].append("file")
     logging.config.dictConfig(logging_config)
 
-    # Add these methods so that stdout can be redirected to logging.
-    logging.write = lambda msg: logging.info(msg) if msg != '\n' else None
-    logging.flush = lambda : None
+    # Route prints through logging one complete line at a time. The
+    # handlers above already hold on to the original stdout.
+    sys.stdout = _StreamToLogger(logging.getLogger('stdout'), logging.INFO)
+    sys.stderr = _StreamToLogger(logging.getLogger('stderr'),
+                                 logging.WARNING)
+
+
+class _StreamToLogger:
+    """File-like object that emits one log record per written line.
+
+    Partial lines are buffered per thread, and a lock shared by all
+    instances serializes the records, so concurrent writers (e.g. the
+    parallel kernel builds) on stdout and stderr never interleave mid-line.
+    A thread's buffer is dropped once it holds no partial line, so
+    short-lived threads do not leave entries behind.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, logger, level):
+        self.logger = logger
+        self.level = level
+        self._buffers = {}
+
+    def write(self, msg):
+        with self._lock:
+            thread = threading.get_ident()
+            buffer = self._buffers.get(thread, '') + msg
+            if '\n' in buffer:
+                *lines, buffer = buffer.split('\n')
+                for line in lines:
+                    if line:
+                        self.logger.log(self.level, line)
+            if buffer:
+                self._buffers[thread] = buffer
+            else:
+                self._buffers.pop(thread, None)
+        return len(msg)
 
-    sys.stdout=logging
-    sys.stderr=logging
+    def flush(self):
+        with self._lock:
+            buffer = self._buffers.pop(threading.get_ident(), '')
+            if buffer:
+                self.logger.log(self.level, buffer)
 
+    def isatty(self):
+        return False
 
 
 def _compile_dependencies():
 
     args = get_args()
 
-    # =========================
-    # Compile dataset C++ code.
-    # =========================
-    # TODO: move this to ninja
-    if torch.distributed.get_rank() == 0:
-        start_time = time.time()
-        print('> compiling dataset index builder ...')
-        from megatron.data.dataset_utils import compile_helper
-        compile_helper()
-        print('>>> done with dataset index builder. Compilation time: {:.3f} '
-              'seconds'.format(time.time() - start_time), flush=True)
-
-    # ==================
-    # Load fused kernels
-    # ==================
+    # ===================================================
+    # Compile dataset C++ code and load fused kernels.
+    # ===================================================
 
     # Custom kernel constraints check.
     seq_len = args.seq_length
@@ -194,27 +243,73 @@ def _compile_dependencies():
                   ' fused softmax kernel are not met. We default'
                   ' back to unfused kernel invocations.', flush=True)
     
-    # Always build on rank zero first.
-    if torch.distributed.get_rank() == 0:
+    # Build on the first rank of every node; the other ranks of the node
+    # wait for it and then load the cached kernels. The dataset C++ helpers
+    # (make + g++) are compiled alongside the fused kernels (ninja + nvcc)
+    # since neither depends on the other.
+    ranks_per_node = _get_ranks_per_node()
+    node_group = _get_node_local_group(ranks_per_node)
+    if torch.distributed.get_rank() % ranks_per_node == 0:
         start_time = time.time()
-        print('> compiling and loading fused kernels ...', flush=True)
-        fused_kernels.load(args)
-        torch.distributed.barrier()
+        if torch.distributed.get_rank() == 0:
+            print('> compiling dataset index builder and loading fused '
+                  'kernels ...', flush=True)
+        from megatron.data.dataset_utils import compile_helper
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            helper = executor.submit(compile_helper)
+            fused_kernels.load(args)
+            helper.result()
+        torch.distributed.barrier(group=node_group)
     else:
-        torch.distributed.barrier()
+        torch.distributed.barrier(group=node_group)
         fused_kernels.load(args)
-    # Simple barrier to make sure all ranks have passed the
-    # compilation phase successfully before moving on to the
-    # rest of the program. We think this might ensure that
-    # the lock is released.
-    torch.distributed.barrier()
+    # Every rank has its node's helpers and kernels at this point, so no
+    # global synchronization is needed unless explicitly requested.
+    if args.compile_global_barrier:
+        torch.distributed.barrier()
     if torch.distributed.get_rank() == 0:
-        print('>>> done with compiling and loading fused kernels. '
+        print('>>> done with dataset index builder and fused kernels. '
               'Compilation time: {:.3f} seconds'.format(
                   time.time() - start_time), flush=True)
 
 
 
+def _get_ranks_per_node():
+    """Number of ranks on this node, as reported by the launcher.
+
+    Without launcher information the whole job is treated as one node, so
+    only rank 0 builds and everyone waits on the global barrier.
+    """
+    for name in ('LOCAL_WORLD_SIZE', 'OMPI_COMM_WORLD_LOCAL_SIZE',
+                 'SLURM_NTASKS_PER_NODE'):
+        value = os.environ.get(name, '')
+        if value.isdigit() and int(value) > 0:
+            return int(value)
+    return torch.distributed.get_world_size()
+
+
+def _get_node_local_group(ranks_per_node):
+    """Create a gloo group for this rank's node, or return None to use the
+    default (global) group.
+
+    Ranks are assumed to be laid out contiguously per node. Only this
+    node's group is created, and only when `new_group` supports
+    `use_local_synchronization`; otherwise creating a group per node would
+    cost one world-wide barrier each, more than the single global barrier
+    it is meant to replace.
+    """
+    world_size = torch.distributed.get_world_size()
+    if ranks_per_node >= world_size:
+        return None
+    if 'use_local_synchronization' not in \
+            inspect.signature(torch.distributed.new_group).parameters:
+        return None
+    start = torch.distributed.get_rank() // ranks_per_node * ranks_per_node
+    ranks = list(range(start, min(start + ranks_per_node, world_size)))
+    return torch.distributed.new_group(ranks, backend='gloo',
+                                       use_local_synchronization=True)
+
+
 def _initialize_distributed():
     """Initialize torch.distributed and mpu."""
     args = get_args()
@@ -335,6 +430,19 @@ def set_jit_fusion_options():
     _warmup_jit_function()
 
 
+def _get_num_jit_warmup_iters():
+    """Number of calls after which a scripted function is fully compiled.
+
+    The profiling executor records `num_profiled_runs` executions and
+    builds the fused graph on the next call, so further warmup iterations
+    only relaunch already compiled kernels.
+    """
+    try:
+        return torch._C._jit_get_num_profiled_runs() + 1
+    except AttributeError:
+        return 5
+
+
 def _warmup_jit_function():
     """ Compilie JIT functions before the main training steps """
     args = get_args()
@@ -345,6 +453,21 @@ def _warmup_jit_function():
     else:
         dtype = torch.float32
 
+    # Skip the warmup if it already ran for this configuration.
+    stamp_path = None
+    if args.jit_warmup_stamp_dir is not None:
+        key = hashlib.sha1(repr((
+            args.seq_length, args.hidden_size, args.ffn_hidden_size,
+            args.micro_batch_size, dtype, args.sequence_parallel,
+            args.tensor_model_parallel_size, torch.__version__)).encode())
+        stamp_path = os.path.join(args.jit_warmup_stamp_dir,
+                                  'megatron_warmup_{}.stamp'.format(
+                                      key.hexdigest()))
+        if os.path.exists(stamp_path):
+            return
+
+    num_iters = _get_num_jit_warmup_iters()
+
     # Warmup fused bias+gelu
     bias = torch.rand(args.ffn_hidden_size // args.tensor_model_parallel_size,
                       dtype=dtype, device='cuda')
@@ -355,9 +478,12 @@ def _warmup_jit_function():
     # prop and recomputation
     for bias_grad, input_grad in zip([True, True], [False, True]):
         bias.requires_grad, input.requires_grad = bias_grad, input_grad
-        for _ in range(5):
+        for _ in range(num_iters):
+            # Free each output (and its autograd graph) before the next
+            # call so only one full-size result is alive at a time.
             output = bias_gelu(bias, input)
-    del bias, input, output
+            del output
+    del bias, input
 
     # Warmup fused bias+dropout+add
     if args.sequence_parallel:
@@ -376,7 +502,13 @@ def _warmup_jit_function():
         input.requires_grad = input_grad
         bias.requires_grad = bias_grad
         residual.requires_grad = residual_grad
-        for _ in range(5):
+        for _ in range(num_iters):
             output = bias_dropout_add_fused_train(input, bias, residual, dropout_rate)
-    del bias, input, residual, output
+            del output
+    del bias, input, residual
     torch.cuda.empty_cache()
+
+    if stamp_path is not None:
+        os.makedirs(args.jit_warmup_stamp_dir, exist_ok=True)
+        with open(stamp_path, 'w'):
+            pass
@@ -206,11 +206,40 @@ class DistributedDataParallel(DistributedDataParallelBase):
             buffer_.zero()
 
 
-    def broadcast_params(self):
+    def broadcast_params(self, bucket_size=40000000):
+        """Broadcast parameters from the data parallel source rank.
+
+        Parameters are grouped by type into buckets of at most
+        `bucket_size` elements, each broadcast as a single tensor. The cap
+        bounds the extra memory the flattened copy needs on top of the
+        parameters; a parameter that fills a bucket on its own is
+        broadcast in place.
+        """
+        buckets = {}
+        bucket_numels = {}
         for param in self.module.parameters():
-            torch.distributed.broadcast(param.data,
-                                        src=mpu.get_data_parallel_src_rank(),
-                                        group=mpu.get_data_parallel_group())
+            tp = param.data.type()
+            if tp not in buckets or \
+                    bucket_numels[tp] + param.data.numel() > bucket_size:
+                buckets.setdefault(tp, []).append([])
+                bucket_numels[tp] = 0
+            buckets[tp][-1].append(param.data)
+            bucket_numels[tp] += param.data.numel()
+
+        for tp in buckets:
+            for params in buckets[tp]:
+                if len(params) == 1:
+                    torch.distributed.broadcast(
+                        params[0], src=mpu.get_data_parallel_src_rank(),
+                        group=mpu.get_data_parallel_group())
+                    continue
+                coalesced = _flatten_dense_tensors(params)
+                torch.distributed.broadcast(
+                    coalesced, src=mpu.get_data_parallel_src_rank(),
+                    group=mpu.get_data_parallel_group())
+                for buf, synced in zip(params, _unflatten_dense_tensors(
+                        coalesced, params)):
+                    buf.copy_(synced)
 
 
     def allreduce_gradients(self):
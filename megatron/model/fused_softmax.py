@@ -202,13 +202,28 @@ class FusedScaleMaskSoftmax(nn.Module):
                 return ScaledSoftmax.apply(input, scale)
 
     def forward_torch_softmax(self, input, mask):
-        if self.input_in_float16 and self.softmax_in_fp32:
-            input = input.float()
+        upcast = self.input_in_float16 and self.softmax_in_fp32
 
+        # Avoid extra passes over the attention scores: scale the fp32
+        # copy in place, and without scaling let softmax do the upcast.
         if self.scale is not None:
-            input = input * self.scale
+            if upcast:
+                input = input.float().mul_(self.scale)
+            else:
+                input = input * self.scale
+            upcast_in_softmax = False
+        else:
+            upcast_in_softmax = upcast
+            # mask_func fills in place. The scores are not saved for
+            # backward, so they are only copied where the fp32 upcast
+            # used to provide the copy.
+            if upcast_in_softmax and mask is not None:
+                input = input.clone()
         mask_output = self.mask_func(input, mask) if mask is not None else input
-        probs = torch.nn.Softmax(dim=-1)(mask_output)
+        if upcast_in_softmax:
+            probs = torch.softmax(mask_output, dim=-1, dtype=torch.float32)
+        else:
+            probs = torch.softmax(mask_output, dim=-1)
 
         if self.input_in_float16 and self.softmax_in_fp32:
             if self.input_in_fp16:
@@ -111,7 +111,9 @@ def forward_step(forward_step_func,
     """Forward step for passed-in model.
 
     If first stage, input tensor is obtained from data_iterator, otherwise
-    passed-in input_tensor is used.
+    passed-in input_tensor is used. With collect_non_loss_data, the last
+    stage stores (loss_reduced, non-loss data) pairs from the same forward
+    pass instead of just the reduced losses.
 
     Returns output tensor."""
     args = get_args()
@@ -129,14 +131,15 @@ def forward_step(forward_step_func,
     unwrapped_model.set_input_tensor(input_tensor)
     output_tensor, loss_func = forward_step_func(data_iterator, model)
     if mpu.is_pipeline_last_stage():
-        if not collect_non_loss_data:
-            output_tensor = loss_func(output_tensor)
-            loss, loss_reduced = output_tensor
-            output_tensor = loss / get_num_microbatches()
-            forward_data_store.append(loss_reduced)
-        else:
+        if collect_non_loss_data:
             data = loss_func(output_tensor, non_loss_data=True)
-            forward_data_store.append(data)
+        output_tensor = loss_func(output_tensor)
+        loss, loss_reduced = output_tensor
+        output_tensor = loss / get_num_microbatches()
+        if collect_non_loss_data:
+            forward_data_store.append((loss_reduced, data))
+        else:
+            forward_data_store.append(loss_reduced)
 
     timers('forward-compute').stop()
 
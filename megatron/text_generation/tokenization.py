@@ -16,6 +16,7 @@
 """Tokenization utilities."""
 
 
+import numpy as np
 import torch
 
 
@@ -23,33 +24,63 @@ from megatron import get_tokenizer
 from .communication import broadcast_int_list, broadcast_tensor
 
 
+# Pinned host staging buffers used by detokenize_generations. They are
+# grown on demand and reused across calls.
+_TOKENS_HOST_BUFFER = None
+_LENGTHS_HOST_BUFFER = None
+
+
+def _copy_to_pinned_host(tensor, buffer):
+    """Asynchronously copy `tensor` into (a view of) a pinned host buffer.
+
+    Returns the possibly reallocated buffer and the view holding the copy.
+    The copy is only complete once the current stream reaches this point.
+    """
+    numel = tensor.numel()
+    if buffer is None or buffer.dtype != tensor.dtype or \
+       buffer.numel() < numel:
+        buffer = torch.empty(numel, dtype=tensor.dtype, pin_memory=True)
+    host_tensor = buffer[:numel].view(tensor.size())
+    host_tensor.copy_(tensor, non_blocking=True)
+    return buffer, host_tensor
+
+
 def detokenize_generations(tokens_gpu_tensor,
                            lengths_gpu_tensor,
                            return_segments):
     """Detokenize the generated tokens."""
 
+    global _TOKENS_HOST_BUFFER
+    global _LENGTHS_HOST_BUFFER
+
+    # Start the device to host copies first so they overlap with the setup
+    # below; we only wait for them right before the data is needed.
+    _TOKENS_HOST_BUFFER, tokens_cpu_tensor = _copy_to_pinned_host(
+        tokens_gpu_tensor, _TOKENS_HOST_BUFFER)
+    _LENGTHS_HOST_BUFFER, lengths_cpu_tensor = _copy_to_pinned_host(
+        lengths_gpu_tensor, _LENGTHS_HOST_BUFFER)
+    copied = torch.cuda.Event()
+    copied.record()
+
     tokenizer = get_tokenizer()
 
     prompts_plus_generations = []
     if return_segments:
         prompts_plus_generations_segments = []
 
-    tokens = tokens_gpu_tensor.cpu().numpy().tolist()
-    lengths = lengths_gpu_tensor.cpu().numpy().tolist()
+    # The padded token lists are returned to the caller (and serialized by
+    # the server), so they have to be Python ints; convert straight from
+    # the tensor without the intermediate numpy array.
+    copied.synchronize()
+    tokens = tokens_cpu_tensor.tolist()
+    lengths = lengths_cpu_tensor.tolist()
     for sequence_tokens, length in zip(tokens, lengths):
         sequence_tokens = sequence_tokens[:length]
         prompts_plus_generations.append(
             tokenizer.detokenize(sequence_tokens))
         if return_segments:
-            words = []
-            for token in sequence_tokens:
-                # word = tokenizer.tokenizer.decoder[token]
-                # word = bytearray(
-                #     [tokenizer.tokenizer.byte_decoder[c] for c in word]).decode(
-                #         'utf-8', errors='replace')
-                word = tokenizer.detokenize([token])
-                words.append(word)
-            prompts_plus_generations_segments.append(words)
+            prompts_plus_generations_segments.append(
+                tokenizer.detokenize_segments(sequence_tokens))
 
     if return_segments:
         return tokens, prompts_plus_generations, \
@@ -64,31 +95,40 @@ def tokenize_prompts(prompts=None, tokens_to_generate=None,
 
     # On all ranks set to None so we can pass them to functions
     sizes_list = None
-    prompts_tokens_cuda_long_tensor = None
-    prompts_length_cuda_long_tensor = None
+    prompts_tokens_tensor = None
+    prompts_length_tensor = None
 
     # On the specified rank, build the above.
     if torch.distributed.get_rank() == rank:
         assert prompts is not None
         assert tokens_to_generate is not None
-        # Tensor of tokens padded and their unpadded length.
-        prompts_tokens_cuda_long_tensor, prompts_length_cuda_long_tensor = \
+        # Tensor of tokens padded and their unpadded length, as int32.
+        prompts_tokens_tensor, prompts_length_tensor = \
             _tokenize_prompts_and_batch(prompts, tokens_to_generate, add_BOS)
         # We need the sizes of these tensors for the boradcast
-        sizes_list = [prompts_tokens_cuda_long_tensor.size(0), # Batch size
-                      prompts_tokens_cuda_long_tensor.size(1)] # Sequence lenght
+        sizes_list = [prompts_tokens_tensor.size(0), # Batch size
+                      prompts_tokens_tensor.size(1)] # Sequence lenght
 
     # First, broadcast the sizes.
     sizes_tensor = broadcast_int_list(2, int_list=sizes_list, rank=rank)
 
     # Now that we have the sizes, we can boradcast the tokens
-    # and length tensors.
-    sizes = sizes_tensor.tolist()
-    prompts_tokens_cuda_long_tensor = broadcast_tensor(
-        sizes, torch.int64, tensor=prompts_tokens_cuda_long_tensor, rank=rank)
-    prompts_length_cuda_long_tensor = broadcast_tensor(
-        sizes[0], torch.int64, tensor=prompts_length_cuda_long_tensor,
-        rank=rank)
+    # and length tensors. Both have the same type, so they are packed
+    # into a single buffer and sent with one broadcast. Token ids and
+    # lengths fit in int32, which halves the bytes sent; they are
+    # widened back to int64 for the generation code afterwards.
+    batch_size, samples_length = sizes_tensor.tolist()
+    num_tokens = batch_size * samples_length
+    packed_tensor = None
+    if torch.distributed.get_rank() == rank:
+        packed_tensor = torch.cat([prompts_tokens_tensor.view(-1),
+                                   prompts_length_tensor])
+    packed_tensor = broadcast_tensor(
+        num_tokens + batch_size, torch.int32, tensor=packed_tensor, rank=rank)
+    packed_tensor = packed_tensor.long()
+    prompts_tokens_cuda_long_tensor = packed_tensor[:num_tokens].view(
+        batch_size, samples_length)
+    prompts_length_cuda_long_tensor = packed_tensor[num_tokens:]
 
     return prompts_tokens_cuda_long_tensor, prompts_length_cuda_long_tensor
 
@@ -100,15 +140,15 @@ def _tokenize_prompts_and_batch(prompts, tokens_to_generate, add_BOS):
           plus the number of tokens we would like to generate
         - pad all the sequences to this length so we can convert them
           into a 2D tensor.
+    Tokens and lengths are returned as int32 tensors.
     """
 
     # Tokenize all the prompts.
     tokenizer = get_tokenizer()
+    prompts_tokens = tokenizer.tokenize_batch(prompts)
     if add_BOS:
-        prompts_tokens = [[tokenizer.eod] + tokenizer.tokenize(prompt)
-                          for prompt in prompts]
-    else:
-        prompts_tokens = [tokenizer.tokenize(prompt) for prompt in prompts]
+        prompts_tokens = [[tokenizer.eod] + prompt_tokens
+                          for prompt_tokens in prompts_tokens]
 
     # Now we have a list of list of tokens which each list has a different
     # size. We want to extend this list to:
@@ -120,13 +160,18 @@ def _tokenize_prompts_and_batch(prompts, tokens_to_generate, add_BOS):
     max_prompt_len = max(prompts_length)
     # Number of tokens in the each sample of the batch.
     samples_length = max_prompt_len + tokens_to_generate
-    # Now update the list of list to be of the same size: samples_length.
-    for prompt_tokens, prompt_length in zip(prompts_tokens, prompts_length):
-        padding_size = samples_length - prompt_length
-        prompt_tokens.extend([tokenizer.eod] * padding_size)
+    # Pad into a preallocated array of size [batch, samples_length]
+    # instead of extending each list with Python ints.
+    prompts_tokens_array = np.full((len(prompts_tokens), samples_length),
+                                   tokenizer.eod, dtype=np.int32)
+    for i, (prompt_tokens, prompt_length) in enumerate(
+            zip(prompts_tokens, prompts_length)):
+        prompts_tokens_array[i, :prompt_length] = prompt_tokens
 
     # Now we are in a structured format, we can convert to tensors.
-    prompts_tokens_tensor = torch.cuda.LongTensor(prompts_tokens)
-    prompts_length_tensor = torch.cuda.LongTensor(prompts_length)
+    prompts_tokens_tensor = torch.from_numpy(
+        prompts_tokens_array).pin_memory().cuda(non_blocking=True)
+    prompts_length_tensor = torch.tensor(
+        prompts_length, dtype=torch.int32).pin_memory().cuda(non_blocking=True)
 
     return prompts_tokens_tensor, prompts_length_tensor
@@ -118,10 +118,18 @@ class AbstractTokenizer(ABC):
     def tokenize(self, text):
         pass
 
+    def tokenize_batch(self, texts):
+        """Tokenize a list of texts, returning a list of token id lists."""
+        return [self.tokenize(text) for text in texts]
+
     def detokenize(self, token_ids):
         raise NotImplementedError('detokenizer is not implemented for {} '
                                   'tokenizer'.format(self.name))
 
+    def detokenize_segments(self, token_ids):
+        """Detokenize each token id on its own, returning a list of strings."""
+        return [self.detokenize([token_id]) for token_id in token_ids]
+
     @property
     def cls(self):
         raise NotImplementedError('CLS is not provided for {} '
@@ -310,6 +318,13 @@ class _GPT2BPETokenizer(AbstractTokenizer):
     def detokenize(self, token_ids):
         return self.tokenizer.decode(token_ids)
 
+    def detokenize_segments(self, token_ids):
+        byte_decoder = self.tokenizer.byte_decoder
+        errors = self.tokenizer.errors
+        return [bytearray([byte_decoder[c] for c in token]).decode(
+                    'utf-8', errors=errors)
+                for token in self.tokenizer.convert_ids_to_tokens(token_ids)]
+
     @property
     def eod(self):
         return self.eod_id
@@ -347,9 +362,16 @@ class _HFTokenizer(AbstractTokenizer):
     def tokenize(self, text):
         return self.tokenizer.encode(text)
 
+    def tokenize_batch(self, texts):
+        return self.tokenizer(texts)['input_ids']
+
     def detokenize(self, token_ids):
         return self.tokenizer.decode(token_ids)
 
+    def detokenize_segments(self, token_ids):
+        return self.tokenizer.batch_decode([[token_id]
+                                            for token_id in token_ids])
+
     @property
     def eod(self):
         return self.eod_id
@@ -16,6 +16,7 @@
 """Pretrain utilities."""
 
 from datetime import datetime
+import itertools
 import math
 import sys
 import time
@@ -26,6 +27,41 @@ except ModuleNotFoundError:
     print('Wandb import failed', flush=True)
 # The earliest we can measure the start time.
 _TRAIN_START_TIME = time.time()
+# CUDA event marking the start of the current logging interval.
+_INTERVAL_START_EVENT = None
+# Timers reported by training_log, in order.
+_TIMER_NAMES_TO_LOG = (
+    'forward-compute',
+    'forward-recv',
+    'forward-send',
+    'forward-backward-send-forward-backward-recv',
+    'backward-compute',
+    'backward-recv',
+    'backward-send',
+    'backward-send-forward-recv',
+    'backward-send-backward-recv',
+    'backward-params-all-reduce',
+    'backward-layernorm-all-reduce',
+    'backward-embedding-all-reduce',
+    'backward-reduce-model-grads',
+    'backward-gather-model-params',
+    'optimizer-copy-to-main-grad',
+    'optimizer-unscale-and-check-inf',
+    'optimizer-clip-main-grad',
+    'optimizer-count-zeros',
+    'optimizer-inner-step',
+    'optimizer-copy-main-to-model-params',
+    'optimizer',
+    'batch-generator',
+)
+# (number of timers, timers to log) as of the last training_log call.
+_TIMERS_TO_LOG_CACHE = None
+# Whether this rank is on the last pipeline stage, set by the first
+# train_step; pipeline ranks do not change during training.
+_IS_LAST_PP = None
+# Stream and flag for the --exit-duration-in-mins all-reduce.
+_EXIT_CHECK_STREAM = None
+_EXIT_CHECK_FLAG = None
 import torch
 from torch.nn.parallel.distributed import DistributedDataParallel as torchDDP
 
@@ -33,7 +69,6 @@ from megatron import get_args
 from megatron import get_signal_handler
 from megatron import get_timers
 from megatron import get_tensorboard_writer
-from megatron import get_current_global_batch_size
 from megatron import get_num_microbatches
 from megatron import is_last_rank
 from megatron import update_num_microbatches
@@ -42,6 +77,7 @@ from megatron import print_rank_0
 from megatron import print_rank_last
 from megatron.checkpointing import load_checkpoint
 from megatron.checkpointing import save_checkpoint
+from megatron.checkpointing import finalize_async_save
 from megatron.model import Float16Module
 from megatron.model import ModelType
 from megatron.optimizer import get_megatron_optimizer
@@ -61,12 +97,62 @@ from megatron.data.dataset_utils import analyze_data_prefix
 
 
 def print_datetime(string):
-    """Note that this call will sync across all ranks."""
-    torch.distributed.barrier()
+    """Note that this call only syncs across all ranks with
+    --sync-log-datetime."""
+    if get_args().sync_log_datetime and torch.distributed.is_initialized():
+        torch.distributed.barrier()
     time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print_rank_0('[' + string + '] datetime: {} '.format(time_str))
 
 
+def _maybe_empty_cache(iteration, interval=50, min_fragmentation=0.25):
+    """Release cached allocator blocks every `interval` iterations, and only
+    if at least `min_fragmentation` of the reserved memory is inactive."""
+    if iteration % interval != 0:
+        return
+    stats = torch.cuda.memory_stats()
+    reserved = max(stats.get('reserved_bytes.all.current', 0), 1)
+    fragmentation = 1 - stats.get('active_bytes.all.current', 0) / reserved
+    if fragmentation > min_fragmentation:
+        torch.cuda.empty_cache()
+
+
+def _start_exit_duration_check(train_time):
+    """All-reduce whether any rank ran out of time on a side stream, so
+    that it does not wait for the kernels of the current step. Returns the
+    result tensor and an event to wait on before reading it."""
+    global _EXIT_CHECK_STREAM, _EXIT_CHECK_FLAG
+    args = get_args()
+    if _EXIT_CHECK_STREAM is None:
+        _EXIT_CHECK_STREAM = torch.cuda.Stream()
+        _EXIT_CHECK_FLAG = torch.zeros(1, dtype=torch.int32, device='cuda')
+    with torch.cuda.stream(_EXIT_CHECK_STREAM):
+        _EXIT_CHECK_FLAG.fill_(int(train_time > args.exit_duration_in_mins))
+        torch.distributed.all_reduce(
+            _EXIT_CHECK_FLAG, op=torch.distributed.ReduceOp.MAX)
+        done_event = _EXIT_CHECK_STREAM.record_event()
+    return _EXIT_CHECK_FLAG, done_event
+
+
+def start_interval_timing():
+    """Start measuring the logging interval time with CUDA events."""
+    global _INTERVAL_START_EVENT
+    _INTERVAL_START_EVENT = torch.cuda.Event(enable_timing=True)
+    _INTERVAL_START_EVENT.record()
+
+
+def interval_elapsed_time():
+    """Seconds since the interval was started, restarting it. Only the end
+    event is waited on, instead of synchronizing the whole device."""
+    global _INTERVAL_START_EVENT
+    end_event = torch.cuda.Event(enable_timing=True)
+    end_event.record()
+    end_event.synchronize()
+    elapsed_time = _INTERVAL_START_EVENT.elapsed_time(end_event) / 1000.0
+    _INTERVAL_START_EVENT = end_event
+    return elapsed_time
+
+
 def pretrain(train_valid_test_dataset_provider,
              model_provider,
              model_type,
@@ -112,8 +198,11 @@ def pretrain(train_valid_test_dataset_provider,
     # Adjust the startup time so it reflects the largest value.
     # This will be closer to what scheduler will see (outside of
     # image ... launches.
+    # NCCL can only reduce device tensors; other backends reduce on the host.
     global _TRAIN_START_TIME
-    start_time_tensor = torch.cuda.DoubleTensor([_TRAIN_START_TIME])
+    device = 'cuda' if torch.distributed.get_backend() == 'nccl' else 'cpu'
+    start_time_tensor = torch.tensor([_TRAIN_START_TIME],
+                                     dtype=torch.float64, device=device)
     torch.distributed.all_reduce(start_time_tensor,
                                  op=torch.distributed.ReduceOp.MIN)
     _TRAIN_START_TIME = start_time_tensor.item()
@@ -135,8 +224,18 @@ def pretrain(train_valid_test_dataset_provider,
     # Data stuff.
     timers('train/valid/test-data-iterators-setup').start()
     if args.virtual_pipeline_model_parallel_size is not None:
+        # Every model chunk reads the same datasets, so only build them once
+        # and give each chunk its own data loaders over them.
+        built_datasets = []
+
+        def shared_dataset_provider(train_val_test_num_samples):
+            if not built_datasets:
+                built_datasets.append(train_valid_test_dataset_provider(
+                    train_val_test_num_samples))
+            return built_datasets[0]
+
         all_data_iterators = [
-            build_train_valid_test_data_iterators(train_valid_test_dataset_provider)
+            build_train_valid_test_data_iterators(shared_dataset_provider)
             for _ in range(len(model))
         ]
         train_data_iterator = [data_iterators[0] for data_iterators in all_data_iterators]
@@ -173,6 +272,7 @@ def pretrain(train_valid_test_dataset_provider,
 
     if args.save and iteration != 0:
         save_checkpoint(iteration, model, optimizer, opt_param_scheduler)
+    finalize_async_save()
 
     if args.do_test:
         # Run on test data.
@@ -196,15 +296,9 @@ def update_train_iters(args):
 
     else:
         # Sample based training with rampup batch size.
-        iterations = 0
-        consumed_samples = 0
-        # Rampup phase.
-        while consumed_samples <= int(args.rampup_batch_size[2]):
-            update_num_microbatches(consumed_samples, consistency_check=False)
-            consumed_samples += get_current_global_batch_size()
-            iterations += 1
-        # Reset
-        update_num_microbatches(0, consistency_check=False)
+        iterations, consumed_samples = _rampup_iterations(
+            int(args.rampup_batch_size[0]), int(args.rampup_batch_size[1]),
+            int(args.rampup_batch_size[2]), args.global_batch_size)
         # Constant phase
         # Note that we throw away any partial last batch.
         iterations += (args.train_samples - consumed_samples) // \
@@ -214,6 +308,43 @@ def update_train_iters(args):
     print_rank_0('setting training iterations to {}'.format(args.train_iters))
 
 
+def _rampup_iterations(start_batch_size, batch_size_increment,
+                       rampup_samples, global_batch_size):
+    """Number of iterations and samples consumed by the batch size rampup.
+
+    Matches stepping RampupBatchsizeNumMicroBatches one iteration at a time
+    while the consumed samples are within the rampup, but advances over
+    each stretch of constant batch size at once.
+    """
+    num_increments = (global_batch_size - start_batch_size) // \
+                     batch_size_increment
+    samples_per_increment = rampup_samples / num_increments
+    iterations = 0
+    consumed_samples = 0
+    while consumed_samples <= rampup_samples:
+        step = int(consumed_samples / samples_per_increment)
+        batch_size = start_batch_size + step * batch_size_increment
+
+        def in_step(n):
+            samples = consumed_samples + n * batch_size
+            return samples <= rampup_samples and \
+                int(samples / samples_per_increment) == step
+
+        # Last iteration that still uses this batch size. The estimate can
+        # be off by one due to float rounding, so correct it the same way
+        # the calculator rounds.
+        last = min((rampup_samples - consumed_samples) // batch_size,
+                   max(0, math.ceil(((step + 1) * samples_per_increment -
+                                     consumed_samples) / batch_size) - 1))
+        while in_step(last + 1):
+            last += 1
+        while not in_step(last):
+            last -= 1
+        iterations += last + 1
+        consumed_samples += (last + 1) * batch_size
+    return iterations, consumed_samples
+
+
 def get_model(model_provider_func, model_type=ModelType.encoder_or_decoder, wrap_with_ddp=True):
     """Build the model."""
     args = get_args()
@@ -271,10 +402,13 @@ def get_model(model_provider_func, model_type=ModelType.encoder_or_decoder, wrap
     # Set tensor model parallel attributes if not set.
     # Only parameters that are already tensor model parallel have these
     # attributes set for them. We should make sure the default attributes
-    # are set for all params so the optimizer can use them.
+    # are set for all params so the optimizer can use them. The parameters
+    # are counted in the same pass.
+    num_parameters = 0
     for model_module in model:
         for param in model_module.parameters():
             mpu.set_defaults_if_not_set_tensor_model_parallel_attributes(param)
+            num_parameters += param.numel()
 
     # Print number of parameters.
     if mpu.get_data_parallel_rank() == 0:
@@ -282,13 +416,20 @@ def get_model(model_provider_func, model_type=ModelType.encoder_or_decoder, wrap
               'model parallel rank ({}, {}): {}'.format(
             mpu.get_tensor_model_parallel_rank(),
             mpu.get_pipeline_model_parallel_rank(),
-            sum([sum([p.nelement() for p in model_module.parameters()])
-                 for model_module in model])), flush=True)
+            num_parameters), flush=True)
 
     # GPU allocation.
     for model_module in model:
         model_module.cuda(torch.cuda.current_device())
 
+    # Compile before wrapping so that the compiled graphs are captured
+    # underneath the fp16 and DDP hooks. Module.compile() compiles in place,
+    # which keeps the state dict keys and the model attributes unchanged.
+    if args.use_torch_compile:
+        for model_module in model:
+            model_module.compile(backend='inductor', mode='max-autotune',
+                                 fullgraph=False)
+
     # Fp16 conversion.
     if args.fp16 or args.bf16:
         model = [Float16Module(model_module, args) for model_module in model]
@@ -414,6 +555,12 @@ def train_step(forward_step_func, data_iterator,
     """Single training step."""
     args = get_args()
     timers = get_timers()
+    num_microbatches = get_num_microbatches()
+    if args.vision_pretraining and args.vision_pretraining_type == "dino":
+        dino_model = unwrap_model(model[0],
+                                  (torchDDP, LocalDDP, Float16Module))
+    else:
+        dino_model = None
 
     # Set grad to zero.
     if args.DDP_impl == 'local' and args.use_contiguous_buffers_in_local_ddp:
@@ -427,8 +574,11 @@ def train_step(forward_step_func, data_iterator,
         forward_step_func, data_iterator, model,
         optimizer, timers, forward_only=False)
 
-    # Empty unused memory.
-    if args.empty_unused_memory_level >= 1:
+    # Empty unused memory: periodically and only when fragmented at level 1,
+    # unconditionally at level 2.
+    if args.empty_unused_memory_level == 1:
+        _maybe_empty_cache(args.curr_iteration)
+    elif args.empty_unused_memory_level >= 2:
         torch.cuda.empty_cache()
 
     # Reduce gradients.
@@ -437,10 +587,8 @@ def train_step(forward_step_func, data_iterator,
     timers('backward-reduce-model-grads').stop()
 
     # Vision gradients.
-    if args.vision_pretraining and args.vision_pretraining_type == "dino":
-        unwrapped_model = unwrap_model(model[0],
-                                       (torchDDP, LocalDDP, Float16Module))
-        unwrapped_model.cancel_gradients_last_layer(args.curr_iteration)
+    if dino_model is not None:
+        dino_model.cancel_gradients_last_layer(args.curr_iteration)
 
     # Update parameters.
     timers('optimizer').start()
@@ -454,14 +602,12 @@ def train_step(forward_step_func, data_iterator,
         timers('backward-gather-model-params').stop()
 
     # Vision momentum.
-    if args.vision_pretraining and args.vision_pretraining_type == "dino":
-        unwrapped_model = unwrap_model(model[0],
-                                       (torchDDP, LocalDDP, Float16Module))
-        unwrapped_model.update_momentum(args.curr_iteration)
+    if dino_model is not None:
+        dino_model.update_momentum(args.curr_iteration)
 
     # Update learning rate.
     if update_successful:
-        increment = get_num_microbatches() * \
+        increment = num_microbatches * \
                     args.micro_batch_size * \
                     args.data_parallel_size
         opt_param_scheduler.step(increment=increment)
@@ -473,16 +619,31 @@ def train_step(forward_step_func, data_iterator,
     if args.empty_unused_memory_level >= 2:
         torch.cuda.empty_cache()
 
-    if mpu.is_pipeline_last_stage(ignore_virtual=True):
-        # Average loss across microbatches.
-        loss_reduced = {}
-        for key in losses_reduced[0]:
-            losses_reduced_for_key = [x[key] for x in losses_reduced]
-            loss_reduced[key] = sum(losses_reduced_for_key) / len(losses_reduced_for_key)
+    global _IS_LAST_PP
+    if _IS_LAST_PP is None:
+        _IS_LAST_PP = mpu.is_pipeline_last_stage(ignore_virtual=True)
+    if _IS_LAST_PP:
+        # Average loss across microbatches with a single reduction over a
+        # [num_microbatches, num_keys] view of the stacked losses.
+        keys = list(losses_reduced[0].keys())
+        losses = torch.stack([x[key] for x in losses_reduced for key in keys])
+        means = losses.view(len(losses_reduced), len(keys),
+                            *losses.shape[1:]).mean(dim=0)
+        loss_reduced = dict(zip(keys, means.unbind(0)))
         return loss_reduced, skipped_iter, grad_norm, num_zeros_in_grad
     return {}, skipped_iter, grad_norm, num_zeros_in_grad
 
 
+def _accumulate_loss(total_loss_dict, key, value):
+    """Add `value` to the fp32 accumulator for `key`, which is allocated
+    on first use and updated in place afterwards."""
+    accumulator = total_loss_dict.get(key)
+    if accumulator is None:
+        accumulator = total_loss_dict[key] = torch.zeros(
+            1, device='cuda', dtype=torch.float32)
+    accumulator.add_(value.detach())
+
+
 def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
                  loss_scale, report_memory_flag, skipped_iter,
                  grad_norm, params_norm, num_zeros_in_grad):
@@ -490,11 +651,15 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
     args = get_args()
     timers = get_timers()
     writer = get_tensorboard_writer()
+    is_last = is_last_rank()
+    is_log_iteration = iteration % args.log_interval == 0
 
     # Advanced, skipped, and Nan iterations.
     advanced_iters_key = 'advanced iterations'
     skipped_iters_key = 'skipped iterations'
     nan_iters_key = 'nan iterations'
+    # Device-side count of nan iterations, only read back when logging.
+    nan_accum_key = '_nan_accum'
     # Advanced iterations.
     if not skipped_iter:
         total_loss_dict[advanced_iters_key] = total_loss_dict.get(
@@ -506,48 +671,27 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
     total_loss_dict[skipped_iters_key] = total_loss_dict.get(
         skipped_iters_key, 0) + skipped_iter
     # Update losses and set nan iterations
-    got_nan = False
-    for key in loss_dict:
-        if not skipped_iter:
-            total_loss_dict[key] = total_loss_dict.get(
-                key, torch.cuda.FloatTensor([0.0])) + loss_dict[key]
-        else:
-            value = loss_dict[key].float().sum().item()
-            is_nan = value == float('inf') or \
-                     value == -float('inf') or \
-                     value != value
-            got_nan = got_nan or is_nan
-    total_loss_dict[nan_iters_key] = total_loss_dict.get(
-        nan_iters_key, 0) + int(got_nan)
-
-    # Logging.
-    timers_to_log = []
-
-    def add_to_logging(name):
-        if name in timers.timers:
-            timers_to_log.append(name)
-    add_to_logging('forward-compute')
-    add_to_logging('forward-recv')
-    add_to_logging('forward-send')
-    add_to_logging('forward-backward-send-forward-backward-recv')
-    add_to_logging('backward-compute')
-    add_to_logging('backward-recv')
-    add_to_logging('backward-send')
-    add_to_logging('backward-send-forward-recv')
-    add_to_logging('backward-send-backward-recv')
-    add_to_logging('backward-params-all-reduce')
-    add_to_logging('backward-layernorm-all-reduce')
-    add_to_logging('backward-embedding-all-reduce')
-    add_to_logging('backward-reduce-model-grads')
-    add_to_logging('backward-gather-model-params')
-    add_to_logging('optimizer-copy-to-main-grad')
-    add_to_logging('optimizer-unscale-and-check-inf')
-    add_to_logging('optimizer-clip-main-grad')
-    add_to_logging('optimizer-count-zeros')
-    add_to_logging('optimizer-inner-step')
-    add_to_logging('optimizer-copy-main-to-model-params')
-    add_to_logging('optimizer')
-    add_to_logging('batch-generator')
+    if nan_accum_key not in total_loss_dict:
+        total_loss_dict[nan_accum_key] = torch.zeros(
+            1, device='cuda', dtype=torch.int32)
+    if not skipped_iter:
+        for key in loss_dict:
+            _accumulate_loss(total_loss_dict, key, loss_dict[key])
+    elif loss_dict:
+        losses = torch.cat([loss_dict[key].float().view(-1)
+                            for key in loss_dict])
+        got_nan = torch.isfinite(losses).all().logical_not_()
+        total_loss_dict[nan_accum_key] += got_nan.int()
+
+    # Logging. Timers are created lazily, so only rebuild the list when
+    # new ones have appeared.
+    global _TIMERS_TO_LOG_CACHE
+    if _TIMERS_TO_LOG_CACHE is None or \
+       _TIMERS_TO_LOG_CACHE[0] != len(timers.timers):
+        _TIMERS_TO_LOG_CACHE = (len(timers.timers),
+                                [name for name in _TIMER_NAMES_TO_LOG
+                                 if name in timers.timers])
+    timers_to_log = _TIMERS_TO_LOG_CACHE[1]
 
     # Calculate batch size.
     batch_size = args.micro_batch_size * args.data_parallel_size * \
@@ -558,7 +702,7 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
 
     # Tensorboard values.
     if writer and (iteration % args.tensorboard_log_interval == 0 ) and \
-       is_last_rank():
+       is_last:
         if args.log_learning_rate_to_tensorboard:
             writer.add_scalar('learning-rate', learning_rate, iteration)
             writer.add_scalar('learning-rate vs samples', learning_rate,
@@ -567,9 +711,13 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
             writer.add_scalar('batch-size', batch_size, iteration)
             writer.add_scalar('batch-size vs samples', batch_size,
                               args.consumed_train_samples)
-        for key in loss_dict:
-            writer.add_scalar(key , loss_dict[key], iteration)
-            writer.add_scalar(key + ' vs samples', loss_dict[key],
+        # Read all losses back with a single device-to-host copy.
+        loss_values = torch.cat([loss_dict[key].float().view(-1)
+                                 for key in loss_dict]).tolist() \
+            if loss_dict else []
+        for key, value in zip(loss_dict, loss_values):
+            writer.add_scalar(key , value, iteration)
+            writer.add_scalar(key + ' vs samples', value,
                               args.consumed_train_samples)
         if args.log_loss_scale_to_tensorboard:
             writer.add_scalar('loss-scale', loss_scale, iteration)
@@ -613,12 +761,13 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
             )
     
 
-    if iteration % args.log_interval == 0:
-        elapsed_time = timers('interval-time').elapsed()
+    if is_log_iteration:
+        elapsed_time = interval_elapsed_time()
         elapsed_time_per_iteration = elapsed_time / total_iterations
         
-        num_gpus = args.data_parallel_size * args.tensor_model_parallel_size * args.pipeline_model_parallel_size
-        tokens_per_sec_per_gpu = (args.seq_length * batch_size) / num_gpus / elapsed_time_per_iteration
+        # data * tensor * pipeline parallel size, as set in validate_args.
+        tokens_per_sec_per_gpu = (args.seq_length * batch_size) / \
+            args.world_size / elapsed_time_per_iteration
 
         tflops = get_tflops(batch_size, elapsed_time_per_iteration)
         if writer:
@@ -635,14 +784,21 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
             elapsed_time_per_iteration * 1000.0)
         log_string += ' learning rate: {:.3E} |'.format(learning_rate)
         log_string += ' global batch size: {:5d} |'.format(batch_size)
-        for key in total_loss_dict:
-            if key not in [advanced_iters_key, skipped_iters_key,
-                           nan_iters_key]:
-                avg = total_loss_dict[key].item() / \
-                      float(max(1, total_loss_dict[advanced_iters_key]))
-                if avg > 0.0:
-                    log_string += ' {}: {:.6E} |'.format(key, avg)
-                total_loss_dict[key] = torch.cuda.FloatTensor([0.0])
+        # Read the loss accumulators and the nan count back with a single
+        # device-to-host copy, then reset them in place.
+        loss_keys = [key for key in total_loss_dict
+                     if key not in [advanced_iters_key, skipped_iters_key,
+                                    nan_iters_key, nan_accum_key]]
+        accumulators = [total_loss_dict[key] for key in loss_keys] + \
+                       [total_loss_dict[nan_accum_key]]
+        values = torch.cat([acc.float() for acc in accumulators]).tolist()
+        for acc in accumulators:
+            acc.zero_()
+        total_loss_dict[nan_iters_key] = int(values[-1])
+        for key, value in zip(loss_keys, values):
+            avg = value / float(max(1, total_loss_dict[advanced_iters_key]))
+            if avg > 0.0:
+                log_string += ' {}: {:.6E} |'.format(key, avg)
         log_string += ' loss scale: {:.1f} |'.format(loss_scale)
         if grad_norm is not None:
             log_string += ' grad norm: {:.3f} |'.format(grad_norm)
@@ -667,7 +823,7 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
         timers.log(timers_to_log, normalizer=args.log_interval)
 
     # Weights and biases reporting
-    if (iteration % args.log_interval == 0) and is_last_rank() and args.wandb_project_name:
+    if is_log_iteration and is_last and args.wandb_project_name:
         metrics = {
             'learning-rate': learning_rate,
             'samples': args.consumed_train_samples,
@@ -682,13 +838,21 @@ def training_log(loss_dict, total_loss_dict, learning_rate, iteration,
 
 
 def save_checkpoint_and_time(iteration, model, optimizer, opt_param_scheduler):
+    args = get_args()
     timers = get_timers()
+    # Tell NCCL which device to run the barriers on, rather than having
+    # it guess from the rank.
+    barrier_kwargs = {}
+    if torch.distributed.get_backend() == 'nccl':
+        barrier_kwargs['device_ids'] = [torch.cuda.current_device()]
     # Extra barrier is added to make sure
     # all ranks report the max time.
-    torch.distributed.barrier()
+    torch.distributed.barrier(**barrier_kwargs)
     timers('save-checkpoint').start()
-    save_checkpoint(iteration, model, optimizer, opt_param_scheduler)
-    torch.distributed.barrier()
+    save_checkpoint(iteration, model, optimizer, opt_param_scheduler,
+                    async_save=args.async_save)
+    if not args.async_save:
+        torch.distributed.barrier(**barrier_kwargs)
     timers('save-checkpoint').stop()
     timers.log(['save-checkpoint'])
 
@@ -716,7 +880,12 @@ def train(forward_step_func, model, optimizer, opt_param_scheduler,
     # Iterations.
     iteration = args.iteration
 
-    timers('interval-time').start()
+    # The number of microbatches can change during rampup, but the samples
+    # per microbatch across data parallel ranks do not.
+    micro_batch_times_data_parallel = args.micro_batch_size * \
+                                      args.data_parallel_size
+
+    start_interval_timing()
     print_datetime('before the start of training step')
     report_memory_flag = True
     while iteration < args.train_iters:
@@ -729,15 +898,37 @@ def train(forward_step_func, model, optimizer, opt_param_scheduler,
                        optimizer,
                        opt_param_scheduler)
         iteration += 1
-        args.consumed_train_samples += mpu.get_data_parallel_world_size() * \
-                                       args.micro_batch_size * \
+        args.consumed_train_samples += micro_batch_times_data_parallel * \
                                        get_num_microbatches()
 
-        # Logging.
-        loss_scale = optimizer.get_loss_scale().item()
-        params_norm = None
-        if args.log_params_norm:
-            params_norm = calc_params_l2_norm(model)
+        # Start the exit duration check here so that it overlaps with the
+        # rest of the step; it is only read back further down.
+        check_exit_duration = args.exit_duration_in_mins and \
+            iteration % args.log_interval == 0
+        if check_exit_duration:
+            train_time = (time.time() - _TRAIN_START_TIME) / 60.0
+            done_cuda, done_event = _start_exit_duration_check(train_time)
+
+        # Logging. The loss scale and the params norm live on the device;
+        # only produce them on iterations where training_log reports them,
+        # and read them back together.
+        log_scalars = {}
+        if iteration % args.log_interval == 0 or \
+           (iteration % args.tensorboard_log_interval == 0 and
+            get_tensorboard_writer()):
+            log_scalars['loss-scale'] = optimizer.get_loss_scale()
+        # The params norm is a full model reduction, so it is only
+        # computed for the console log; the tensorboard interval defaults
+        # to every iteration.
+        if args.log_params_norm and iteration % args.log_interval == 0:
+            log_scalars['params-norm'] = calc_params_l2_norm(model,
+                                                             as_tensor=True)
+        if log_scalars:
+            log_scalars = dict(zip(log_scalars, torch.cat(
+                [value.float().view(-1)
+                 for value in log_scalars.values()]).tolist()))
+        loss_scale = log_scalars.get('loss-scale')
+        params_norm = log_scalars.get('params-norm')
         report_memory_flag = training_log(loss_dict, total_loss_dict,
                                           optimizer.param_groups[0]['lr'],
                                           iteration, loss_scale,
@@ -768,6 +959,7 @@ def train(forward_step_func, model, optimizer, opt_param_scheduler,
             if any(signal_handler.signals_received()):
                 save_checkpoint_and_time(iteration, model, optimizer,
                                          opt_param_scheduler)
+                finalize_async_save()
                 print_datetime('exiting program after receiving SIGTERM.')
                 sys.exit()
 
@@ -777,18 +969,16 @@ def train(forward_step_func, model, optimizer, opt_param_scheduler,
                                      opt_param_scheduler)
             saved_checkpoint = True
 
-        # Exiting based on duration
-        if args.exit_duration_in_mins:
-            train_time = (time.time() - _TRAIN_START_TIME) / 60.0
-            done_cuda = torch.cuda.IntTensor(
-                [train_time > args.exit_duration_in_mins])
-            torch.distributed.all_reduce(
-                done_cuda, op=torch.distributed.ReduceOp.MAX)
+        # Exiting based on duration, checked once per log interval to
+        # keep the all-reduce off most iterations.
+        if check_exit_duration:
+            done_event.synchronize()
             done = done_cuda.item()
             if done:
                 if not saved_checkpoint:
                     save_checkpoint_and_time(iteration, model, optimizer,
                                              opt_param_scheduler)
+                finalize_async_save()
                 print_datetime('exiting program after {} minutes'.format(train_time))
                 sys.exit()
 
@@ -797,6 +987,7 @@ def train(forward_step_func, model, optimizer, opt_param_scheduler,
             if not saved_checkpoint:
                 save_checkpoint_and_time(iteration, model, optimizer,
                                          opt_param_scheduler)
+            finalize_async_save()
             torch.distributed.barrier()
             print_datetime('exiting program at iteration {}'.format(iteration))
             sys.exit()
@@ -821,6 +1012,19 @@ def evaluate(forward_step_func,
         model_module.eval()
 
     total_loss_dict = {}
+    collected_non_loss_data = None
+    # Neither changes during evaluation.
+    num_microbatches = get_num_microbatches()
+    is_last_pp = mpu.is_pipeline_last_stage(ignore_virtual=True)
+    forward_backward_func = get_forward_backward_func()
+    consumed_samples_per_iteration = args.micro_batch_size * \
+                                     args.data_parallel_size * \
+                                     num_microbatches
+
+    # Empty unused memory once up front; only the aggressive level keeps
+    # doing so after every eval iteration.
+    if args.empty_unused_memory_level == 1:
+        torch.cuda.empty_cache()
 
     with torch.no_grad():
         iteration = 0
@@ -830,37 +1034,43 @@ def evaluate(forward_step_func,
                 print_rank_0('Evaluating iter {}/{}'.format(iteration,
                                                             args.eval_iters))
 
-            forward_backward_func = get_forward_backward_func()
+            # Collect the non-loss data from the last iteration's forward
+            # pass rather than running an extra one.
+            collect_non_loss_data = process_non_loss_data_func is not None \
+                and iteration == args.eval_iters
             loss_dicts = forward_backward_func(
                 forward_step_func, data_iterator, model, optimizer=None,
-                timers=None, forward_only=True)
+                timers=None, forward_only=True,
+                collect_non_loss_data=collect_non_loss_data)
 
             # Empty unused memory
-            if args.empty_unused_memory_level >= 1:
+            if args.empty_unused_memory_level >= 2:
                 torch.cuda.empty_cache()
 
-            if mpu.is_pipeline_last_stage(ignore_virtual=True):
+            # Only the last pipeline stage gets losses back; the other
+            # stages just run the forward pass and count samples.
+            if is_last_pp:
+                if collect_non_loss_data:
+                    if is_last_rank():
+                        collected_non_loss_data = [x[1] for x in loss_dicts]
+                    loss_dicts = [x[0] for x in loss_dicts]
                 # Reduce across processes.
                 for loss_dict in loss_dicts:
                     for key in loss_dict:
-                        total_loss_dict[key] = total_loss_dict.get(
-                            key, torch.cuda.FloatTensor([0.0])) + loss_dict[key]
-
-            args.consumed_valid_samples += mpu.get_data_parallel_world_size() \
-                                           * args.micro_batch_size \
-                                           * get_num_microbatches()
-        collected_non_loss_data = None
-        if process_non_loss_data_func is not None and is_last_rank():
-            collected_non_loss_data = forward_backward_func(
-                forward_step_func, data_iterator, model, optimizer=None,
-                timers=None, forward_only=True, collect_non_loss_data=True)
+                        _accumulate_loss(total_loss_dict, key, loss_dict[key])
+
+            args.consumed_valid_samples += consumed_samples_per_iteration
 
     # Move model back to the train mode.
     for model_module in model:
         model_module.train()
 
-    for key in total_loss_dict:
-        total_loss_dict[key] /= args.eval_iters * get_num_microbatches()
+    # Average all losses with a single division.
+    if total_loss_dict:
+        keys = list(total_loss_dict)
+        averages = torch.cat([total_loss_dict[key] for key in keys]).div_(
+            args.eval_iters * num_microbatches)
+        total_loss_dict = dict(zip(keys, averages.split(1)))
 
     return total_loss_dict, collected_non_loss_data
 
@@ -880,16 +1090,22 @@ def evaluate_and_print_results(prefix, forward_step_func,
         process_non_loss_data_func, verbose)
     string = '{} loss at {} | '.format(ds_name, prefix) if ds_name is not None\
         else 'validation loss at {} | '.format(prefix)
-    for key in total_loss_dict:
-        string += '{} value: {:.6E} | '.format(key, total_loss_dict[key].item())
-        ppl = math.exp(min(20, total_loss_dict[key].item()))
+    # Read all losses back to the host with a single copy.
+    loss_values = {}
+    if total_loss_dict:
+        keys = list(total_loss_dict)
+        loss_values = dict(zip(keys, torch.cat(
+            [total_loss_dict[key] for key in keys]).tolist()))
+    for key, value in loss_values.items():
+        string += '{} value: {:.6E} | '.format(key, value)
+        ppl = math.exp(min(20, value))
         string += '{} PPL: {:.6E} | '.format(key, ppl)
         if writer:
             writer.add_scalar(f'{tf_plot_prefix}/{key} validation',
-                              total_loss_dict[key].item(),
+                              value,
                               iteration)
             writer.add_scalar(f'{tf_plot_prefix}/{key} validation vs samples',
-                              total_loss_dict[key].item(),
+                              value,
                               args.consumed_train_samples)
             if args.log_validation_ppl_to_tensorboard:
                 writer.add_scalar(f'{tf_plot_prefix}/{key} validation ppl', ppl,
@@ -900,7 +1116,7 @@ def evaluate_and_print_results(prefix, forward_step_func,
     # Weights and biases reporting
     if is_last_rank() and args.wandb_project_name:
         metrics = {
-            f'{tf_plot_prefix}/{key} validation': total_loss_dict[key].item() for key in total_loss_dict
+            f'{tf_plot_prefix}/{key} validation': value for key, value in loss_values.items()
         }
         wandb.log(metrics, step=iteration)
 
@@ -914,9 +1130,20 @@ def evaluate_and_print_results(prefix, forward_step_func,
 
 
 def cyclic_iter(iter):
-    while True:
-        for x in iter:
-            yield x
+    # Starts a new pass over `iter` whenever the previous one is exhausted,
+    # without going through a Python frame for every item.
+    return itertools.chain.from_iterable(itertools.repeat(iter))
+
+
+def _build_eval_iterator(dataloader, dl_type, num_micro_batches=None):
+    """Iterator over an eval dataloader, cycled independently of the others
+    and stopped after `num_micro_batches` batches when given."""
+    if dl_type == 'single':
+        return iter(dataloader)
+    data_iterator = cyclic_iter(dataloader)
+    if num_micro_batches is not None:
+        data_iterator = itertools.islice(data_iterator, num_micro_batches)
+    return data_iterator
 
 def build_train_valid_test_data_iterators(
         build_train_valid_test_datasets_provider):
@@ -1025,17 +1252,21 @@ def build_train_valid_test_data_iterators(
     else:
         train_data_iterator = None
 
+    # Validation iterators are reused by every evaluation during training,
+    # so they stay unbounded; the test set is evaluated once.
     if valid_dataloaders is not None:
-        valid_data_iterators = [iter(vdl) if dl_type == 'single' \
-                              else iter(cyclic_iter(valid_dataloaders))
-                                 for vdl in valid_dataloaders]
+        valid_data_iterators = [_build_eval_iterator(vdl, dl_type)
+                                for vdl in valid_dataloaders]
     else:
         valid_data_iterators = [None] * num_valid_ds
 
     if test_dataloaders is not None:
-        test_data_iterators = [iter(tdl) if dl_type == 'single' \
-                             else iter(cyclic_iter(test_dataloaders))
-                            for tdl in test_dataloaders]
+        # Each eval iteration consumes one full global batch of micro batches.
+        test_micro_batches = args.eval_iters * args.global_batch_size // \
+            (args.micro_batch_size * args.data_parallel_size)
+        test_data_iterators = [_build_eval_iterator(tdl, dl_type,
+                                                    test_micro_batches)
+                               for tdl in test_dataloaders]
     else:
         test_data_iterators = [None] * num_test_ds
 
@@ -46,8 +46,9 @@ def unwrap_model(model, module_instances=(torchDDP)):
     return unwrapped_model
 
 
-def calc_params_l2_norm(model):
-    """Calculate l2 norm of parameters """
+def calc_params_l2_norm(model, as_tensor=False):
+    """Calculate l2 norm of parameters. With `as_tensor`, the norm is
+    returned as a device tensor instead of being read back."""
     args = get_args()
     if not isinstance(model, list):
         model = [model]
@@ -75,6 +76,8 @@ def calc_params_l2_norm(model):
     torch.distributed.all_reduce(norm_2,
                                  op=torch.distributed.ReduceOp.SUM,
                                  group=mpu.get_model_parallel_group())
+    if as_tensor:
+        return norm_2.sqrt()
     return norm_2.item() ** 0.5
 
 
@@ -92,6 +95,9 @@ def average_losses_across_data_parallel_group(losses):
 
 def report_memory(name):
     """Simple GPU memory report."""
+    # Only data parallel rank 0 prints, so skip the queries elsewhere.
+    if mpu.get_data_parallel_rank() != 0:
+        return
     mega_bytes = 1024.0 * 1024.0
     string = name + ' memory (MB)'
     string += ' | allocated: {}'.format(
@@ -102,9 +108,8 @@ def report_memory(name):
         torch.cuda.memory_reserved() / mega_bytes)
     string += ' | max reserved: {}'.format(
         torch.cuda.max_memory_reserved() / mega_bytes)
-    if mpu.get_data_parallel_rank() == 0:
-        print("[Rank {}] {}".format(torch.distributed.get_rank(), string),
-              flush=True)
+    print("[Rank {}] {}".format(torch.distributed.get_rank(), string),
+          flush=True)
 
 
 def print_params_min_max_norm(optimizer, iteration):
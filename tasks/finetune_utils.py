@@ -22,12 +22,14 @@ import torch
 from megatron import get_args, get_num_microbatches
 from megatron import print_rank_0
 from megatron import get_timers
+from megatron import get_tensorboard_writer
 from megatron import mpu
 from megatron.checkpointing import load_checkpoint
 from megatron.checkpointing import save_checkpoint
 from megatron.model import ModelType
 from megatron.training import evaluate_and_print_results
 from megatron.training import setup_model_and_optimizer
+from megatron.training import start_interval_timing
 from megatron.training import train_step
 from megatron.training import training_log
 from megatron.utils import average_losses_across_data_parallel_group
@@ -178,7 +180,7 @@ def _train(model, optimizer, opt_param_scheduler, forward_step,
     report_memory_flag = True
 
     # For each remaining epoch
-    timers('interval-time').start()
+    start_interval_timing()
     for epoch in range(start_epoch, args.epochs):
         print_rank_0('working on epoch {} ...'.format(epoch + 1))
 
@@ -195,19 +197,26 @@ def _train(model, optimizer, opt_param_scheduler, forward_step,
             start_iteration = 0
 
             # Train for one step.
+            args.curr_iteration = iteration
             out = train_step(forward_step, batch, model, optimizer, opt_param_scheduler)
 
             losses_dict, skipped_iter, grad_norm, num_zeros_in_grad = out
             iteration += 1
 
-            # Logging.
+            # Logging. Only read the loss scale back on iterations where
+            # training_log reports it.
+            loss_scale = None
+            if iteration % args.log_interval == 0 or \
+               (iteration % args.tensorboard_log_interval == 0 and
+                get_tensorboard_writer()):
+                loss_scale = optimizer.get_loss_scale().item()
             params_norm = None
-            if args.log_params_norm:
+            if args.log_params_norm and iteration % args.log_interval == 0:
                 params_norm = calc_params_l2_norm(model)
             report_memory_flag = training_log(losses_dict, losses_dict_sum,
                                               optimizer.param_groups[0]['lr'],
                                               iteration,
-                                              optimizer.get_loss_scale().item(),
+                                              loss_scale,
                                               report_memory_flag, skipped_iter,
                                               grad_norm, params_norm, num_zeros_in_grad)
 
@@ -20,11 +20,13 @@ import torch.nn.functional as F
 from megatron import get_args
 from megatron import print_rank_0
 from megatron import get_timers
+from megatron import get_tensorboard_writer
 from megatron import mpu, utils
 from megatron.checkpointing import load_checkpoint
 from megatron.checkpointing import save_checkpoint
 from megatron.training import evaluate_and_print_results
 from megatron.training import setup_model_and_optimizer
+from megatron.training import start_interval_timing
 from megatron.training import train_step
 from megatron.training import training_log
 from megatron.utils import check_adlr_autoresume_termination
@@ -136,7 +138,7 @@ def _train(
     report_memory_flag = True
 
     # For each remaining epoch
-    timers("interval-time").start()
+    start_interval_timing()
     for epoch in range(start_epoch, args.epochs):
         print_rank_0("working on epoch {} ...".format(epoch + 1))
 
@@ -154,20 +156,27 @@ def _train(
             start_iteration = 0
 
             # Train for one step.
+            args.curr_iteration = iteration
             losses_dict, skipped_iter, grad_norm, num_zeros_in_grad = train_step(
                 forward_step, batch, model, optimizer, opt_param_scheduler
             )
             iteration += 1
 
-            # Logging.
+            # Logging. Only read the loss scale back on iterations where
+            # training_log reports it.
             params_norm = None
+            loss_scale = None
+            if iteration % args.log_interval == 0 or \
+               (iteration % args.tensorboard_log_interval == 0 and
+                get_tensorboard_writer()):
+                loss_scale = optimizer.get_loss_scale().item()
 
             report_memory_flag = training_log(
                 losses_dict,
                 losses_dict_sum,
                 optimizer.param_groups[0]["lr"],
                 iteration,
-                optimizer.get_loss_scale().item(),
+                loss_scale,
                 report_memory_flag,
                 skipped_iter,
                 grad_norm,
@@ -0,0 +1,62 @@
+import threading
+import types
+
+import pytest
+
+from megatron import checkpointing
+
+
+@pytest.fixture
+def save_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpointing, 'get_args',
+                        lambda: types.SimpleNamespace(save=str(tmp_path)))
+    monkeypatch.setattr(checkpointing, '_ASYNC_SAVE', None)
+    return tmp_path
+
+
+def _start_async_save(target, iteration):
+    errors = []
+
+    def write():
+        try:
+            target()
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    checkpointing._ASYNC_SAVE = (thread, iteration, errors)
+
+
+def test_finalize_async_save_writes_tracker_after_files(save_dir):
+    release = threading.Event()
+    checkpoint = save_dir / 'iter_0000005' / 'model_optim_rng.pt'
+    tracker = save_dir / 'latest_checkpointed_iteration.txt'
+
+    def write():
+        release.wait()
+        checkpoint.parent.mkdir()
+        checkpoint.write_text('state')
+
+    _start_async_save(write, 5)
+    # The background save is not the latest checkpoint until finalized.
+    assert not tracker.exists()
+    release.set()
+    checkpointing.finalize_async_save()
+    assert checkpoint.read_text() == 'state'
+    assert tracker.read_text() == '5'
+    assert checkpointing._ASYNC_SAVE is None
+    # Nothing is pending any more.
+    checkpointing.finalize_async_save()
+
+
+def test_finalize_async_save_reraises_writer_errors(save_dir):
+
+    def write():
+        raise OSError('disk full')
+
+    _start_async_save(write, 7)
+    with pytest.raises(OSError, match='disk full'):
+        checkpointing.finalize_async_save()
+    assert not (save_dir / 'latest_checkpointed_iteration.txt').exists()
+    assert checkpointing._ASYNC_SAVE is None
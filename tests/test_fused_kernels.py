@@ -0,0 +1,54 @@
+import sys
+
+from megatron.fused_kernels.utils import _kernel_cache_key
+from megatron.fused_kernels.utils import _load_cached_extension
+from megatron.fused_kernels.utils import _publish_to_kernel_cache
+
+
+def _write_sources(tmp_path):
+    source = tmp_path / 'kernel.cu'
+    source.write_text('__global__ void kernel() {}\n')
+    header = tmp_path / 'kernel.h'
+    header.write_text('#pragma once\n')
+    return [source], header
+
+
+def test_kernel_cache_key_is_stable(tmp_path):
+    sources, _ = _write_sources(tmp_path)
+    key = _kernel_cache_key('kernel', sources, ['-O3'], 'nvcc 11.8')
+    assert key == _kernel_cache_key('kernel', sources, ['-O3'], 'nvcc 11.8')
+
+
+def test_kernel_cache_key_changes_with_inputs(tmp_path):
+    sources, header = _write_sources(tmp_path)
+    key = _kernel_cache_key('kernel', sources, ['-O3'], 'nvcc 11.8')
+    assert key != _kernel_cache_key('other', sources, ['-O3'], 'nvcc 11.8')
+    assert key != _kernel_cache_key('kernel', sources, ['-O2'], 'nvcc 11.8')
+    assert key != _kernel_cache_key('kernel', sources, ['-O3'], 'nvcc 12.1')
+    header.write_text('#pragma once\n#define CHANGED\n')
+    assert key != _kernel_cache_key('kernel', sources, ['-O3'], 'nvcc 11.8')
+
+
+def test_kernel_cache_round_trip(tmp_path):
+    library = tmp_path / 'built.py'
+    library.write_text('VALUE = 42\n')
+    cachepath = tmp_path / 'cache'
+    cachepath.mkdir()
+    cached = cachepath / 'cached_kernel_test-0123.py'
+
+    _publish_to_kernel_cache(library, cached)
+    assert cached.read_text() == 'VALUE = 42\n'
+    # Publishing again leaves the existing entry alone.
+    library.write_text('VALUE = 0\n')
+    _publish_to_kernel_cache(library, cached)
+    assert cached.read_text() == 'VALUE = 42\n'
+    # No temporary files are left behind.
+    assert sorted(p.name for p in cachepath.iterdir()) == \
+        [cached.name, cached.name + '.lock']
+
+    module = _load_cached_extension('cached_kernel_test', cached)
+    try:
+        assert module.VALUE == 42
+        assert sys.modules['cached_kernel_test'] is module
+    finally:
+        del sys.modules['cached_kernel_test']
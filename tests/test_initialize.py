@@ -0,0 +1,59 @@
+import logging
+import threading
+
+from megatron.initialize import _StreamToLogger
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _make_stream(name):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = _ListHandler()
+    logger.addHandler(handler)
+    return _StreamToLogger(logger, logging.INFO), handler
+
+
+def test_stream_to_logger_buffers_lines():
+    stream, handler = _make_stream('test_stream_to_logger_buffers_lines')
+    stream.write('partial')
+    assert handler.messages == []
+    stream.write(' line\nsecond\n\nthird')
+    assert handler.messages == ['partial line', 'second']
+    stream.flush()
+    assert handler.messages == ['partial line', 'second', 'third']
+    stream.flush()
+    assert handler.messages == ['partial line', 'second', 'third']
+    assert stream._buffers == {}
+
+
+def test_stream_to_logger_keeps_threads_apart():
+    stream, handler = _make_stream('test_stream_to_logger_keeps_threads_apart')
+
+    def write_lines(name):
+        for i in range(200):
+            stream.write('{}-'.format(name))
+            stream.write('{}\n'.format(i))
+
+    threads = [threading.Thread(target=write_lines, args=(name,))
+               for name in 'abcd']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(handler.messages) == 800
+    # Threads that ended on a complete line leave no buffer behind.
+    assert stream._buffers == {}
+    for name in 'abcd':
+        assert [m for m in handler.messages if m.startswith(name + '-')] == \
+            ['{}-{}'.format(name, i) for i in range(200)]
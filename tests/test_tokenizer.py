@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from megatron.tokenizer.gpt2_tokenization import bytes_to_unicode
+from megatron.tokenizer.tokenizer import _GPT2BPETokenizer
+
+
+@pytest.fixture
+def gpt2_tokenizer(tmp_path):
+    # Byte-level vocabulary plus a few merges, enough to exercise BPE.
+    merges = [('h', 'e'), ('l', 'l'), ('he', 'll'), ('Ġ', 'w'), ('o', 'r')]
+    tokens = list(bytes_to_unicode().values()) + \
+        [a + b for a, b in merges] + ['<|endoftext|>']
+    vocab_file = tmp_path / 'vocab.json'
+    vocab_file.write_text(json.dumps(
+        {token: i for i, token in enumerate(tokens)}))
+    merge_file = tmp_path / 'merges.txt'
+    merge_file.write_text('#version: 0.2\n' +
+                          ''.join('{} {}\n'.format(a, b) for a, b in merges))
+    return _GPT2BPETokenizer(str(vocab_file), str(merge_file))
+
+
+TEXTS = ['hello world', 'Hello, world!\n', '', 'café ☃ ok']
+
+
+def test_tokenize_batch_matches_tokenize(gpt2_tokenizer):
+    assert gpt2_tokenizer.tokenize_batch(TEXTS) == \
+        [gpt2_tokenizer.tokenize(text) for text in TEXTS]
+
+
+def test_detokenize_segments_matches_detokenize(gpt2_tokenizer):
+    for text in TEXTS:
+        token_ids = gpt2_tokenizer.tokenize(text)
+        assert gpt2_tokenizer.detokenize_segments(token_ids) == \
+            [gpt2_tokenizer.detokenize([token_id]) for token_id in token_ids]
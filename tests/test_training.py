@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+from megatron.microbatches import RampupBatchsizeNumMicroBatches
+from megatron.training import _build_eval_iterator
+from megatron.training import _rampup_iterations
+from megatron.training import cyclic_iter
+
+
+def _rampup_iterations_reference(start_batch_size, batch_size_increment,
+                                 rampup_samples, global_batch_size):
+    # One iteration at a time, as train_samples were converted before.
+    calculator = RampupBatchsizeNumMicroBatches(
+        start_batch_size, batch_size_increment, rampup_samples,
+        global_batch_size, micro_batch_size=1, data_parallel_size=1)
+    iterations = 0
+    consumed_samples = 0
+    while consumed_samples <= rampup_samples:
+        calculator.update(consumed_samples, consistency_check=False)
+        consumed_samples += calculator.get_current_global_batch_size()
+        iterations += 1
+    return iterations, consumed_samples
+
+
+@pytest.mark.parametrize('start,increment,samples,global_batch_size', [
+    (32, 32, 1000, 1024),
+    (16, 8, 12345, 512),
+    (1, 1, 100, 17),
+    (3, 3, 7, 30),
+    (64, 64, 300000, 2048),
+    (8, 8, 1000000, 1024),
+])
+def test_rampup_iterations_matches_stepping(start, increment, samples,
+                                            global_batch_size):
+    assert _rampup_iterations(start, increment, samples, global_batch_size) \
+        == _rampup_iterations_reference(start, increment, samples,
+                                        global_batch_size)
+
+
+def test_cyclic_iter_restarts():
+    assert list(itertools.islice(cyclic_iter([1, 2, 3]), 7)) == \
+        [1, 2, 3, 1, 2, 3, 1]
+
+
+def test_eval_iterators_cycle_independently():
+    dataloaders = [[1, 2, 3], ['a', 'b']]
+    iterators = [_build_eval_iterator(dl, 'cyclic') for dl in dataloaders]
+    assert list(itertools.islice(iterators[0], 4)) == [1, 2, 3, 1]
+    assert list(itertools.islice(iterators[1], 5)) == ['a', 'b', 'a', 'b', 'a']
+    assert next(iterators[0]) == 2
+
+
+def test_eval_iterator_bounds():
+    assert list(_build_eval_iterator([1, 2, 3], 'cyclic', 5)) == \
+        [1, 2, 3, 1, 2]
+    assert list(_build_eval_iterator([1, 2, 3], 'cyclic', 2)) == [1, 2]
+    # The single pass type ends with the dataloader, bounded or not.
+    assert list(_build_eval_iterator([1, 2, 3], 'single')) == [1, 2, 3]
+    assert list(_build_eval_iterator([1, 2, 3], 'single', 5)) == [1, 2, 3]